@@ -14,6 +14,121 @@ import threading
 import queue
 from datetime import datetime
 import os
+import sys
+import re
+import binascii
+import bisect
+import selectors
+import zlib
+
+# Optional: libjpeg-turbo bindings for faster JPEG decode (falls back to OpenCV)
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJFLAG_FASTDCT, TJFLAG_FASTUPSAMPLE
+except ImportError:
+    TurboJPEG = None
+
+# +EVT:RXP2P:<RSSI>:<SNR>:<HexData> - one compiled pass extracts all fields and validates the hex
+_RXP2P_RE = re.compile(r'^\+EVT:RXP2P:(-?\d+):(-?\d+):([0-9A-Fa-f]*)\s*$')
+
+# RSSI quality classes, indexed by bisect.bisect_right(_RSSI_EDGES, rssi):
+# 0 = poor (<-100), 1 = fair (-100..-86), 2 = good (-85..-71), 3 = excellent (>=-70)
+_RSSI_EDGES = (-100, -85, -70)
+_RSSI_ICON = ("🔴", "🟠", "🟡", "🟢")
+_RSSI_LABEL = ("POOR", "FAIR", "GOOD", "EXCELLENT")
+_RSSI_NOTE = ("consider moving closer", "acceptable", "reliable", "very strong")
+
+# Packet type bytes that mark image traffic (start, fragment, parity, end)
+_IMG_HDR = frozenset((ord('S'), ord('F'), ord('P'), ord('E')))
+
+# Packet headers after type(1) + image_id(8), compiled once instead of parsing the format per packet
+_HEADER_OFFSET = 9
+_S_START = struct.Struct('<IId')   # total_size, total_fragments, start timestamp
+_S_FRAG = struct.Struct('<IIHI')   # fragment_id, total_fragments, data_length, crc32
+_S_PARITY = struct.Struct('<HHHI') # parity_id, parity_count, data_length, crc32
+_S_END = struct.Struct('<d')       # end timestamp
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic variants)
+_JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+
+
+def _jpeg_dimensions(data):
+    """
+    Read (width, height) from a JPEG's SOF header without decoding it
+    Returns None if data is not a JPEG or no SOF marker is found
+    """
+    if data[:2] != b'\xff\xd8':
+        return None
+    
+    i = 2
+    size = len(data)
+    while i + 4 <= size:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # markers without a length field
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):  # end of image / start of scan - no SOF before it
+            return None
+        
+        segment_length = int.from_bytes(data[i + 2:i + 4], 'big')
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > size:
+                return None
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+        i += 2 + segment_length
+    
+    return None
+
+
+class SignalStats:
+    """
+    Running count/sum/min/max/sum-of-squares of RSSI or SNR samples
+    O(1) per sample and per report - individual samples are not kept
+    """
+    __slots__ = ('count', 'total', 'total_sq', 'minimum', 'maximum')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_sq = 0
+        self.minimum = 10**9
+        self.maximum = -10**9
+    
+    def add(self, value):
+        """Add one sample"""
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+    
+    def merge(self, other):
+        """Fold another accumulator into this one"""
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+    
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+    
+    @property
+    def std(self):
+        if not self.count:
+            return 0.0
+        return max(self.total_sq / self.count - self.mean ** 2, 0.0) ** 0.5
+
 
 class RAK3172ImageReceiver:
     """
@@ -29,6 +144,43 @@ class RAK3172ImageReceiver:
         self.completed_images = []
         self.image_save_dir = "received_images"
         
+        # Reassembly buffers recycled across images (avoids a large alloc + zero-fill per image)
+        self._buf_pool = []
+        self._buf_pool_max = 4
+        self._buf_lock = threading.Lock()  # the save thread returns buffers too
+        
+        # Packet type byte -> handler
+        self._packet_handlers = {
+            ord('S'): self._handle_start_packet,
+            ord('F'): self._handle_fragment_packet,
+            ord('P'): self._handle_parity_packet,
+            ord('E'): self._handle_end_packet,
+        }
+        
+        # Print fragment progress every N fragments (plus the last one) - console output is slow
+        self.progress_every = 10
+        self._t0 = time.monotonic()
+        
+        # Fast JPEG decoder, if PyTurboJPEG and libturbojpeg are available
+        self._jpeg = None
+        if TurboJPEG is not None:
+            try:
+                self._jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"⚠️  TurboJPEG unavailable, using OpenCV decoder: {e}")
+        
+        # Serial lines handed from the reader thread to the parser
+        self._line_queue = queue.SimpleQueue()
+        self._reader_thread = None
+        self._reader_running = False
+        
+        # Completed images handed to the save thread so disk writes never block reception -
+        # unbounded so a slow disk can't stall the packet path (images arrive minutes apart)
+        self._save_q = queue.SimpleQueue()
+        self._saves_flushed = False
+        self._writer_thread = threading.Thread(target=self._writer, daemon=True)
+        self._writer_thread.start()
+        
         # Create directory for saving images
         os.makedirs(self.image_save_dir, exist_ok=True)
         
@@ -38,15 +190,24 @@ class RAK3172ImageReceiver:
             self.connection = serial.Serial(
                 port=self.serial_port,
                 baudrate=self.baud_rate,
-                timeout=1,
+                timeout=0.5,  # readline() blocks up to this long waiting for a full line
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 bytesize=serial.EIGHTBITS
             )
             
+            # Larger driver RX buffer so fragment bursts are not dropped (Windows only)
+            if hasattr(self.connection, 'set_buffer_size'):
+                self.connection.set_buffer_size(rx_size=65536)
+            
             print("🔧 Setting up RAK3172 for receiving...")
             self.setup_rak3172_receiver()
             
+            # Drain the UART on a dedicated thread so slow parsing/printing never stalls it
+            self._reader_running = True
+            self._reader_thread = threading.Thread(target=self._reader, daemon=True)
+            self._reader_thread.start()
+            
             print(f"✅ Receiver initialized: {self.serial_port} at {self.baud_rate} baud")
             return True
             
@@ -92,25 +253,70 @@ class RAK3172ImageReceiver:
         response = self.connection.read_all().decode().strip()
         print(f"✅ P2P RX enabled: {response}")
     
+    def _open_selector(self):
+        """Selector on the serial fd (POSIX), or None where the port is not selectable (Windows)"""
+        try:
+            selector = selectors.DefaultSelector()
+            selector.register(self.connection.fileno(), selectors.EVENT_READ)
+            return selector
+        except Exception:
+            return None
+    
+    def _reader(self):
+        """Reader thread: only reads complete lines from serial and queues them"""
+        # With a selector we sleep in epoll/kqueue until the UART has data, then take
+        # everything buffered in one read instead of pyserial's byte-by-byte readline()
+        selector = self._open_selector()
+        pending = b''
+        while self._reader_running:
+            try:
+                if selector is not None:
+                    if not selector.select(timeout=0.5):
+                        continue
+                    raw = self.connection.read(self.connection.in_waiting or 1)
+                else:
+                    raw = self.connection.readline()
+            except Exception as e:
+                if self._reader_running:
+                    print(f"❌ Serial read error: {e}")
+                break
+            
+            if not raw:
+                continue
+            
+            # A read can end mid-line; keep the partial data until '\n' arrives
+            pending += raw
+            if b'\n' not in raw:
+                continue
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                self._line_queue.put(line + b'\n')
+        
+        if selector is not None:
+            selector.close()
+    
     def start_listening(self):
         """Start listening for incoming image transmissions"""
         self.running = True
+        self._t0 = time.monotonic()  # per-message logs show seconds since this point
         print("📡 Starting LoRa image receiver... (Now supports large images >65KB)")
         print("🎯 Waiting for incoming image transmissions...")
         print("Press Ctrl+C to stop\n")
         
         try:
             while self.running:
-                if self.connection.in_waiting > 0:
-                    line = self.connection.readline().decode().strip()
-                    
-                    # Process RAK3172 P2P receive messages
-                    if "+EVT:RXP2P:" in line:
-                        self._process_received_message(line)
-                    elif line.strip():
-                        print(f"ℹ️  Module: {line}")
+                try:
+                    raw = self._line_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
                 
-                time.sleep(0.01)  # Small delay to prevent busy waiting
+                line = raw.decode(errors='replace').strip()
+                
+                # Process RAK3172 P2P receive messages
+                if "+EVT:RXP2P:" in line:
+                    self._process_received_message(line)
+                elif line:
+                    print(f"ℹ️  Module: {line}")
                 
         except KeyboardInterrupt:
             print("\n🛑 Stopping receiver...")
@@ -122,35 +328,33 @@ class RAK3172ImageReceiver:
         """Process received RAK3172 P2P message"""
         try:
             # Parse: +EVT:RXP2P:RSSI:SNR:HexData
-            parts = line.split(":")
-            if len(parts) >= 4:
-                rssi = parts[2]
-                snr = parts[3]
-                hex_data = ":".join(parts[4:]) if len(parts) > 4 else ""
+            match = _RXP2P_RE.match(line)
+            if not match:
+                return
+            rssi, snr, hex_data = match.group(1, 2, 3)
+            
+            # Convert hex to bytes
+            if hex_data and len(hex_data) % 2 == 0:
+                try:
+                    packet_data = binascii.unhexlify(hex_data)
+                except Exception as e:
+                    print(f"⚠️  Hex decode error: {e}")
+                    return
                 
-                # Convert hex to bytes
-                if hex_data:
+                # Check if this is image data or simple text
+                if packet_data and packet_data[0] in _IMG_HDR:
+                    # This is image packet data (starts with S, F, P, or E)
+                    self._handle_image_packet(packet_data, rssi, snr)
+                else:
+                    # This is a simple text message
                     try:
-                        clean_hex = ''.join(c for c in hex_data if c in '0123456789ABCDEFabcdef')
-                        if len(clean_hex) % 2 == 0 and len(clean_hex) > 0:
-                            packet_data = bytes.fromhex(clean_hex)
-                            
-                            # Check if this is image data or simple text
-                            if len(packet_data) > 0 and packet_data[0:1] in [b'S', b'F', b'E']:
-                                # This is image packet data (starts with S, F, or E)
-                                self._handle_image_packet(packet_data, rssi, snr)
-                            else:
-                                # This is a simple text message
-                                try:
-                                    text_message = packet_data.decode('utf-8')
-                                    timestamp = datetime.now().strftime('%H:%M:%S')
-                                    print(f"💬 [{timestamp}] Text Message: '{text_message}' (RSSI={rssi}dBm, SNR={snr}dB)")
-                                except UnicodeDecodeError:
-                                    # Not valid text, show as raw data
-                                    timestamp = datetime.now().strftime('%H:%M:%S')
-                                    print(f"📨 [{timestamp}] Data received: {len(packet_data)} bytes (RSSI={rssi}dBm, SNR={snr}dB)")
-                    except Exception as e:
-                        print(f"⚠️  Hex decode error: {e}")
+                        text_message = packet_data.decode('utf-8')
+                        timestamp = f'{time.monotonic() - self._t0:7.2f}s'
+                        print(f"💬 [{timestamp}] Text Message: '{text_message}' (RSSI={rssi}dBm, SNR={snr}dB)")
+                    except UnicodeDecodeError:
+                        # Not valid text, show as raw data
+                        timestamp = f'{time.monotonic() - self._t0:7.2f}s'
+                        print(f"📨 [{timestamp}] Data received: {len(packet_data)} bytes (RSSI={rssi}dBm, SNR={snr}dB)")
                 
         except Exception as e:
             print(f"❌ Message processing error: {e}")
@@ -160,47 +364,51 @@ class RAK3172ImageReceiver:
         if len(packet_data) < 1:
             return
         
-        packet_type = chr(packet_data[0])
+        handler = self._packet_handlers.get(packet_data[0])
+        if handler is None:
+            print(f"⚠️  Unknown packet type: {chr(packet_data[0])}")
+            return
         
         try:
-            if packet_type == 'S':  # Start packet
-                self._handle_start_packet(packet_data, rssi, snr)
-            elif packet_type == 'F':  # Fragment packet
-                self._handle_fragment_packet(packet_data, rssi, snr)
-            elif packet_type == 'E':  # End packet
-                self._handle_end_packet(packet_data, rssi, snr)
-            else:
-                print(f"⚠️  Unknown packet type: {packet_type}")
+            # Raw id bytes are the dict key - decoded to text only for display
+            image_id = packet_data[1:9].rstrip(b'\x00')
+            # Handlers get a view so payload slices are copied once, straight into the image buffer
+            handler(memoryview(packet_data), image_id, rssi, snr)
                 
         except Exception as e:
             print(f"❌ Packet handling error: {e}")
     
-    def _handle_start_packet(self, packet_data, rssi, snr):
+    def _handle_start_packet(self, packet_data, image_id, rssi, snr):
         """Handle start packet - FIXED: Support for large images >65KB"""
         # FIXED: Changed minimum size from 21 to 25 bytes (added 4 bytes for larger integers)
-        if len(packet_data) < 25:
+        if len(packet_data) < _HEADER_OFFSET + _S_START.size:
             print(f"⚠️  Invalid start packet size: {len(packet_data)} bytes (expected ≥25)")
             return
         
-        image_id = packet_data[1:9].decode('utf-8').rstrip('\x00')
+        # FIXED: '<II' (not '<HH') sizes to support images > 65KB
+        total_size, total_fragments, start_timestamp = _S_START.unpack_from(packet_data, _HEADER_OFFSET)
         
-        # FIXED: Changed from '<HH' to '<II' to support images > 65KB
-        total_size, total_fragments = struct.unpack('<II', packet_data[9:17])
-        start_timestamp = struct.unpack('<d', packet_data[17:25])[0]
+        # A restarted transmission replaces the unfinished one
+        if image_id in self.current_images:
+            self._release_buffer(self.current_images[image_id].pop('buffer', None))
         
         self.current_images[image_id] = {
-            'id': image_id,
+            'id': image_id.decode('utf-8', 'replace'),
             'total_size': total_size,
             'total_fragments': total_fragments,
             'start_timestamp': start_timestamp,
             'receive_start': time.time(),
-            'fragments': {},
+            # Fragments are written straight to their final offset; one bit per fragment tracks arrival
+            'buffer': self._acquire_buffer(total_size),
+            'received_map': bytearray((total_fragments + 7) // 8),
             'received_count': 0,
-            'rssi_values': [int(rssi)],
-            'snr_values': [int(snr)]
+            'rssi_stats': SignalStats(),
+            'snr_stats': SignalStats(),
+            'rssi_quality': [0, 0, 0, 0]  # poor, fair, good, excellent
         }
+        self._add_signal_sample(self.current_images[image_id], int(rssi), int(snr))
         
-        print(f"\n📨 🆕 Started receiving image '{image_id}'")
+        print(f"\n📨 🆕 Started receiving image '{self.current_images[image_id]['id']}'")
         print(f"   📊 Expected: {total_size:,} bytes in {total_fragments:,} fragments")
         print(f"   📡 Signal: RSSI={rssi}dBm, SNR={snr}dB")
         print(f"   🕒 Started at: {datetime.now().strftime('%H:%M:%S')}")
@@ -209,21 +417,20 @@ class RAK3172ImageReceiver:
         estimated_time = (total_fragments * 1.8) / 60  # rough estimate in minutes
         print(f"   ⏱️  Estimated reception time: ~{estimated_time:.1f} minutes")
     
-    def _handle_fragment_packet(self, packet_data, rssi, snr):
+    def _handle_fragment_packet(self, packet_data, image_id, rssi, snr):
         """Handle fragment packet - FIXED: Support for large images >65KB"""
-        # FIXED: Changed minimum size from 15 to 17 bytes (added 2 bytes for larger integers)
-        if len(packet_data) < 17:
-            print(f"⚠️  Invalid fragment packet size: {len(packet_data)} bytes (expected ≥17)")
+        # Header is type(1) + image_id(8) + '<IIHI'(14) = 23 bytes
+        payload_offset = _HEADER_OFFSET + _S_FRAG.size
+        if len(packet_data) < payload_offset:
+            print(f"⚠️  Invalid fragment packet size: {len(packet_data)} bytes (expected ≥{payload_offset})")
             return
         
-        image_id = packet_data[1:9].decode('utf-8').rstrip('\x00')
-        
-        # FIXED: Changed from '<HHH' to '<IIH' (fragment_id and total_fragments as uint32, data_length as uint16)
-        fragment_id, total_fragments, data_length = struct.unpack('<IIH', packet_data[9:17])
-        fragment_data = packet_data[17:17+data_length]
+        # fragment_id and total_fragments as uint32, data_length as uint16, CRC-32 of the data
+        fragment_id, total_fragments, data_length, crc = _S_FRAG.unpack_from(packet_data, _HEADER_OFFSET)
+        fragment_data = packet_data[payload_offset:payload_offset + data_length]
         
         if image_id not in self.current_images:
-            print(f"⚠️  Received fragment for unknown image: {image_id}")
+            print(f"⚠️  Received fragment for unknown image: {image_id.decode('utf-8', 'replace')}")
             return
         
         # Validate fragment data length
@@ -231,27 +438,45 @@ class RAK3172ImageReceiver:
             print(f"⚠️  Fragment data length mismatch: expected {data_length}, got {len(fragment_data)}")
             return
         
+        # A corrupted fragment is dropped - it counts as missing and parity may still recover it
+        if zlib.crc32(fragment_data) != crc:
+            print(f"⚠️  Fragment {fragment_id} failed CRC check - dropped")
+            return
+        
+        current_image = self.current_images[image_id]
+        if fragment_id >= current_image['total_fragments']:
+            print(f"⚠️  Fragment {fragment_id} out of range ({current_image['total_fragments']} fragments)")
+            return
+        
+        # Every fragment but the last is full-size, so the offset follows from its own length;
+        # the last one always ends exactly at total_size
+        if fragment_id == current_image['total_fragments'] - 1:
+            offset = current_image['total_size'] - data_length
+        else:
+            offset = fragment_id * data_length
+        if offset < 0 or offset + data_length > current_image['total_size']:
+            print(f"⚠️  Fragment {fragment_id} does not fit image of {current_image['total_size']:,} bytes")
+            return
+        
         # Store fragment (avoid duplicates)
-        if fragment_id not in self.current_images[image_id]['fragments']:
-            self.current_images[image_id]['fragments'][fragment_id] = fragment_data
-            self.current_images[image_id]['received_count'] += 1
+        received_map = current_image['received_map']
+        bit = 1 << (fragment_id & 7)
+        if not received_map[fragment_id >> 3] & bit:
+            current_image['buffer'][offset:offset + data_length] = fragment_data
+            received_map[fragment_id >> 3] |= bit
+            current_image['received_count'] += 1
         
-        self.current_images[image_id]['rssi_values'].append(int(rssi))
-        self.current_images[image_id]['snr_values'].append(int(snr))
+        self._add_signal_sample(current_image, int(rssi), int(snr))
         
-        received = self.current_images[image_id]['received_count']
-        total = self.current_images[image_id]['total_fragments']
+        received = current_image['received_count']
+        total = current_image['total_fragments']
+        
+        # Throttle console output so printing never falls behind the packet rate
+        if fragment_id % self.progress_every and fragment_id != total - 1:
+            return
         
         # Color code RSSI for quick visual feedback
-        rssi_val = int(rssi)
-        if rssi_val >= -70:
-            rssi_status = "🟢"  # Excellent
-        elif rssi_val >= -85:
-            rssi_status = "🟡"  # Good  
-        elif rssi_val >= -100:
-            rssi_status = "🟠"  # Fair
-        else:
-            rssi_status = "🔴"  # Poor
+        rssi_status = _RSSI_ICON[bisect.bisect_right(_RSSI_EDGES, int(rssi))]
         
         # Show progress with better formatting for large fragment counts
         if total >= 1000:
@@ -263,17 +488,112 @@ class RAK3172ImageReceiver:
                   f"Progress: {received:2d}/{total:2d} ({received/total*100:5.1f}%) "
                   f"{rssi_status} RSSI={rssi}dBm SNR={snr}dB")
     
-    def _handle_end_packet(self, packet_data, rssi, snr):
+    def _handle_parity_packet(self, packet_data, image_id, rssi, snr):
+        """Handle XOR parity packet - parity j covers fragments j, j+N, j+2N... (N = parity_count)"""
+        payload_offset = _HEADER_OFFSET + _S_PARITY.size
+        if len(packet_data) < payload_offset:
+            print(f"⚠️  Invalid parity packet size: {len(packet_data)} bytes (expected ≥{payload_offset})")
+            return
+        
+        parity_id, parity_count, data_length, crc = _S_PARITY.unpack_from(packet_data, _HEADER_OFFSET)
+        parity_data = bytes(packet_data[payload_offset:payload_offset + data_length])
+        
+        if image_id not in self.current_images:
+            print(f"⚠️  Received parity for unknown image: {image_id.decode('utf-8', 'replace')}")
+            return
+        
+        if len(parity_data) != data_length or parity_id >= parity_count or zlib.crc32(parity_data) != crc:
+            print(f"⚠️  Invalid parity packet {parity_id}/{parity_count}")
+            return
+        
+        current_image = self.current_images[image_id]
+        if 'parity' not in current_image:
+            current_image['parity'] = [None] * parity_count
+            current_image['parity_size'] = data_length
+        if parity_count == len(current_image['parity']) and data_length == current_image['parity_size']:
+            current_image['parity'][parity_id] = parity_data
+        
+        self._add_signal_sample(current_image, int(rssi), int(snr))
+    
+    def _recover_fragments(self, image_info):
+        """Rebuild missing fragments from parity (one per parity group), returns how many were recovered"""
+        parity = image_info.get('parity')
+        if not parity:
+            return 0
+        
+        groups = len(parity)
+        chunk_size = image_info['parity_size']
+        total_fragments = image_info['total_fragments']
+        total_size = image_info['total_size']
+        
+        # Parity only makes sense if every fragment but the last is chunk_size long
+        if not (total_fragments - 1) * chunk_size < total_size <= total_fragments * chunk_size:
+            return 0
+        
+        received_map = image_info['received_map']
+        missing_by_group = {}
+        for i in range(total_fragments):
+            if not received_map[i >> 3] & (1 << (i & 7)):
+                missing_by_group.setdefault(i % groups, []).append(i)
+        
+        # Fragments as rows of a zero-padded matrix (the short last fragment is padded like on the sender)
+        buffer = image_info['buffer']
+        padded = np.zeros(total_fragments * chunk_size, dtype=np.uint8)
+        padded[:total_size] = np.frombuffer(buffer, dtype=np.uint8, count=total_size)
+        rows = padded.reshape(total_fragments, chunk_size)
+        
+        recovered = 0
+        for group, missing in missing_by_group.items():
+            if len(missing) != 1 or parity[group] is None:
+                continue
+            
+            fragment_id = missing[0]
+            rows[fragment_id] = 0
+            data = np.bitwise_xor.reduce(rows[group::groups], axis=0) ^ np.frombuffer(parity[group], dtype=np.uint8)
+            
+            offset = fragment_id * chunk_size
+            length = min(chunk_size, total_size - offset)
+            buffer[offset:offset + length] = data[:length].tobytes()
+            received_map[fragment_id >> 3] |= 1 << (fragment_id & 7)
+            image_info['received_count'] += 1
+            recovered += 1
+        
+        return recovered
+    
+    def _add_signal_sample(self, image_info, rssi, snr):
+        """Update the running RSSI/SNR statistics of an image"""
+        image_info['rssi_stats'].add(rssi)
+        image_info['snr_stats'].add(snr)
+        
+        image_info['rssi_quality'][bisect.bisect_right(_RSSI_EDGES, rssi)] += 1
+    
+    def _acquire_buffer(self, size):
+        """Take a pooled buffer of at least size bytes, or allocate one rounded up to 4 KiB"""
+        with self._buf_lock:
+            for i, buf in enumerate(self._buf_pool):
+                if len(buf) >= size:
+                    return self._buf_pool.pop(i)
+        return bytearray((size + 4095) & ~4095)
+    
+    def _release_buffer(self, buf):
+        """Return a reassembly buffer to the pool, keeping at most _buf_pool_max of the largest"""
+        if buf is None:
+            return
+        with self._buf_lock:
+            self._buf_pool.append(buf)
+            if len(self._buf_pool) > self._buf_pool_max:
+                self._buf_pool.remove(min(self._buf_pool, key=len))
+    
+    def _handle_end_packet(self, packet_data, image_id, rssi, snr):
         """Handle end packet"""
-        if len(packet_data) < 17:
+        if len(packet_data) < _HEADER_OFFSET + _S_END.size:
             print("⚠️  Invalid end packet size")
             return
         
-        image_id = packet_data[1:9].decode('utf-8').rstrip('\x00')
-        end_timestamp = struct.unpack('<d', packet_data[9:17])[0]
+        end_timestamp, = _S_END.unpack_from(packet_data, _HEADER_OFFSET)
         
         if image_id not in self.current_images:
-            print(f"⚠️  Received end packet for unknown image: {image_id}")
+            print(f"⚠️  Received end packet for unknown image: {image_id.decode('utf-8', 'replace')}")
             return
         
         current_image = self.current_images[image_id]
@@ -283,11 +603,12 @@ class RAK3172ImageReceiver:
         current_image['transmission_duration'] = end_timestamp - current_image['start_timestamp']
         
         # Calculate signal statistics
-        if current_image['rssi_values']:
-            current_image['avg_rssi'] = sum(current_image['rssi_values']) / len(current_image['rssi_values'])
-            current_image['avg_snr'] = sum(current_image['snr_values']) / len(current_image['snr_values'])
+        rssi_stats = current_image['rssi_stats']
+        if rssi_stats.count:
+            current_image['avg_rssi'] = rssi_stats.mean
+            current_image['avg_snr'] = current_image['snr_stats'].mean
         
-        print(f"\n📨 🏁 Completed receiving image '{image_id}'")
+        print(f"\n📨 🏁 Completed receiving image '{current_image['id']}'")
         print(f"   📊 Received: {current_image['received_count']:,}/{current_image['total_fragments']:,} fragments")
         print(f"   ✅ Success rate: {current_image['received_count']/current_image['total_fragments']*100:.1f}%")
         print(f"   ⏱️  Transmission time: {current_image['transmission_duration']:.2f}s ({current_image['transmission_duration']/60:.1f}min)")
@@ -302,61 +623,62 @@ class RAK3172ImageReceiver:
         
         # RSSI analysis and recommendations
         avg_rssi = current_image.get('avg_rssi', 0)
-        rssi_values = current_image.get('rssi_values', [])
         
-        if rssi_values:
-            rssi_min = min(rssi_values)
-            rssi_max = max(rssi_values)
+        if rssi_stats.count:
+            rssi_min = rssi_stats.minimum
+            rssi_max = rssi_stats.maximum
             rssi_range = rssi_max - rssi_min
+            rssi_std = rssi_stats.std
+            snr_stats = current_image['snr_stats']
             
-            print(f"   📊 RSSI Analysis: Min={rssi_min}dBm, Max={rssi_max}dBm, Range={rssi_range}dB")
+            print(f"   📊 RSSI Analysis: Min={rssi_min}dBm, Max={rssi_max}dBm, Range={rssi_range}dB, Std={rssi_std:.1f}dB")
+            print(f"   📊 SNR Analysis: Min={snr_stats.minimum}dB, Max={snr_stats.maximum}dB, Std={snr_stats.std:.1f}dB")
             
             # Signal quality assessment
-            if avg_rssi >= -70:
-                print(f"   🟢 Signal Quality: EXCELLENT (very strong)")
-            elif avg_rssi >= -85:
-                print(f"   🟡 Signal Quality: GOOD (reliable)")
-            elif avg_rssi >= -100:
-                print(f"   🟠 Signal Quality: FAIR (acceptable)")
-            else:
-                print(f"   🔴 Signal Quality: POOR (consider moving closer)")
+            level = bisect.bisect_right(_RSSI_EDGES, avg_rssi)
+            print(f"   {_RSSI_ICON[level]} Signal Quality: {_RSSI_LABEL[level]} ({_RSSI_NOTE[level]})")
             
-            # Signal stability assessment
-            if rssi_range <= 5:
-                print(f"   📈 Signal Stability: VERY STABLE (±{rssi_range/2:.1f}dB)")
-            elif rssi_range <= 10:
-                print(f"   📈 Signal Stability: STABLE (±{rssi_range/2:.1f}dB)")
-            elif rssi_range <= 20:
-                print(f"   📈 Signal Stability: MODERATE (±{rssi_range/2:.1f}dB)")
+            # Signal stability assessment - standard deviation, so one outlier packet doesn't dominate
+            if rssi_std <= 1.5:
+                print(f"   📈 Signal Stability: VERY STABLE (±{rssi_std:.1f}dB)")
+            elif rssi_std <= 3:
+                print(f"   📈 Signal Stability: STABLE (±{rssi_std:.1f}dB)")
+            elif rssi_std <= 6:
+                print(f"   📈 Signal Stability: MODERATE (±{rssi_std:.1f}dB)")
             else:
-                print(f"   📈 Signal Stability: UNSTABLE (±{rssi_range/2:.1f}dB) - check environment")
+                print(f"   📈 Signal Stability: UNSTABLE (±{rssi_std:.1f}dB) - check environment")
+        
+        # Repair lost fragments from parity before giving up on the image
+        if current_image['received_count'] < current_image['total_fragments']:
+            recovered = self._recover_fragments(current_image)
+            if recovered:
+                print(f"   🛠️  Recovered {recovered:,} fragments from parity")
         
         # Try to reconstruct and save image
+        current_image['reconstructed'] = False
         if current_image['received_count'] == current_image['total_fragments']:
-            reconstructed_image = self._reconstruct_image(current_image)
-            if reconstructed_image is not None:
-                saved_path = self._save_image(reconstructed_image, image_id)
-                current_image['reconstructed'] = True
-                current_image['saved_path'] = saved_path
-                print(f"   💾 Image saved to: {saved_path}")
-                print(f"   🖼️  Image size: {reconstructed_image.shape[1]}x{reconstructed_image.shape[0]} pixels")
-            else:
-                current_image['reconstructed'] = False
-                print(f"   ❌ Failed to reconstruct image")
+            print(f"   🔧 Reconstructing image from {current_image['received_count']:,} fragments ({current_image['total_size']:,} bytes)")
+            
+            # The save thread writes the file and hands the buffer back to the pool
+            self._save_q.put(current_image)
+            print(f"   💾 Image queued for save")
         else:
-            current_image['reconstructed'] = False
             missing = current_image['total_fragments'] - current_image['received_count']
             print(f"   ❌ Incomplete: missing {missing:,} fragments")
             
             # Show which fragments are missing (for debugging, limit to first 20)
             if missing <= 20:
+                received_map = current_image['received_map']
                 missing_fragments = []
                 for i in range(current_image['total_fragments']):
-                    if i not in current_image['fragments']:
+                    if not received_map[i >> 3] & (1 << (i & 7)):
                         missing_fragments.append(i)
                 print(f"   🔍 Missing fragments: {missing_fragments}")
             else:
                 print(f"   🔍 Too many missing fragments to list ({missing:,} total)")
+            
+            # Nothing to save - hand the buffer back for the next image
+            self._release_buffer(current_image.pop('buffer'))
         
         # Store completed image info
         self.completed_images.append(current_image)
@@ -367,33 +689,72 @@ class RAK3172ImageReceiver:
         print(f"   📈 Total images received: {len(self.completed_images)}")
         print()
     
-    def _reconstruct_image(self, image_info):
-        """Reconstruct image from fragments"""
-        try:
-            # Sort fragments by ID and concatenate
-            sorted_fragments = sorted(image_info['fragments'].items())
-            image_data = b''.join([frag[1] for frag in sorted_fragments])
+    def _writer(self):
+        """Save thread - writes completed images to disk off the receive path"""
+        while True:
+            image_info = self._save_q.get()
+            if image_info is None:
+                break
             
-            print(f"   🔧 Reconstructing image from {len(sorted_fragments):,} fragments ({len(image_data):,} bytes)")
+            try:
+                payload = self._assemble_bytes(image_info)
+                saved_path, dimensions = self._save_image(payload, image_info['id'])
+                if saved_path is not None:
+                    image_info['reconstructed'] = True
+                    image_info['saved_path'] = saved_path
+                    print(f"💾 Image '{image_info['id']}' saved to: {saved_path} ({dimensions[0]}x{dimensions[1]} pixels)")
+                else:
+                    print(f"❌ Failed to reconstruct image '{image_info['id']}'")
+            except Exception as e:
+                print(f"❌ Saving image '{image_info['id']}' failed: {e}")
+            finally:
+                payload = None  # drop the view before the buffer is reused
+                self._release_buffer(image_info.pop('buffer', None))
+    
+    def _assemble_bytes(self, image_info):
+        """Return the reassembled payload - fragments already sit at their final offsets"""
+        return memoryview(image_info['buffer'])[:image_info['total_size']]
+    
+    def _decode_image(self, payload):
+        """Decode a payload into a BGR image array (only needed when it can't be saved as-is)"""
+        try:
+            # Hand a view of the payload straight to the decoder (no intermediate bytes object)
+            image_array = np.frombuffer(payload, dtype=np.uint8)
             
-            # Convert bytes to image
-            image_array = np.frombuffer(image_data, dtype=np.uint8)
-            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            if self._jpeg is not None:
+                try:
+                    return self._jpeg.decode(image_array, pixel_format=TJPF_BGR,
+                                             flags=TJFLAG_FASTDCT | TJFLAG_FASTUPSAMPLE)
+                except Exception as e:
+                    print(f"   ⚠️  TurboJPEG decode failed ({e}), retrying with OpenCV")
             
-            return image
+            return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
             
         except Exception as e:
             print(f"❌ Image reconstruction failed: {e}")
             return None
     
-    def _save_image(self, image, image_id):
-        """Save reconstructed image"""
+    def _save_image(self, payload, image_id):
+        """
+        Save reconstructed image, returns (filepath, (width, height)) or (None, None)
+        A JPEG payload is written byte-for-byte - no decode/re-encode round trip
+        """
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{image_id}_{timestamp}.jpg"
         filepath = os.path.join(self.image_save_dir, filename)
         
+        dimensions = _jpeg_dimensions(payload)
+        if dimensions is not None:
+            with open(filepath, 'wb') as f:
+                f.write(payload)
+            return filepath, dimensions
+        
+        # Not a JPEG we can read the header of - decode and re-encode it
+        image = self._decode_image(payload)
+        if image is None:
+            return None, None
         cv2.imwrite(filepath, image)
-        return filepath
+        return filepath, (image.shape[1], image.shape[0])
     
     def print_statistics(self):
         """Print reception statistics with detailed RSSI analysis"""
@@ -412,48 +773,48 @@ class RAK3172ImageReceiver:
         if self.completed_images:
             avg_duration = sum(img.get('receive_duration', 0) for img in self.completed_images) / total_images
             
-            # Collect all RSSI/SNR values
-            all_rssi = []
-            all_snr = []
+            # Combine the per-image running statistics
+            all_rssi = SignalStats()
+            all_snr = SignalStats()
+            excellent = good = fair = poor = 0
             total_size = 0
             total_fragments = 0
             
             for img in self.completed_images:
-                if img.get('rssi_values'):
-                    all_rssi.extend(img['rssi_values'])
-                if img.get('snr_values'):
-                    all_snr.extend(img['snr_values'])
+                all_rssi.merge(img['rssi_stats'])
+                all_snr.merge(img['snr_stats'])
+                img_poor, img_fair, img_good, img_excellent = img['rssi_quality']
+                excellent += img_excellent
+                good += img_good
+                fair += img_fair
+                poor += img_poor
                 total_size += img.get('total_size', 0)
                 total_fragments += img.get('total_fragments', 0)
             
             print(f"   Average reception time: {avg_duration:.2f}s ({avg_duration/60:.1f} minutes)")
             print(f"   Total data received: {total_size/1024:.1f} KB in {total_fragments:,} fragments")
             
-            if all_rssi:
-                avg_rssi = sum(all_rssi) / len(all_rssi)
-                min_rssi = min(all_rssi)
-                max_rssi = max(all_rssi)
-                print(f"\n📡 RSSI Analysis (all {len(all_rssi):,} fragments):")
+            if all_rssi.count:
+                avg_rssi = all_rssi.mean
+                min_rssi = all_rssi.minimum
+                max_rssi = all_rssi.maximum
+                rssi_count = all_rssi.count
+                print(f"\n📡 RSSI Analysis (all {rssi_count:,} fragments):")
                 print(f"   Average RSSI: {avg_rssi:.1f}dBm")
                 print(f"   RSSI Range: {min_rssi}dBm to {max_rssi}dBm")
                 print(f"   RSSI Spread: {max_rssi - min_rssi}dB")
                 
                 # RSSI quality distribution
-                excellent = sum(1 for r in all_rssi if r >= -70)
-                good = sum(1 for r in all_rssi if -85 <= r < -70)
-                fair = sum(1 for r in all_rssi if -100 <= r < -85)
-                poor = sum(1 for r in all_rssi if r < -100)
-                
                 print(f"   Quality Distribution:")
-                print(f"     🟢 Excellent (≥-70dBm): {excellent:,}/{len(all_rssi):,} ({excellent/len(all_rssi)*100:.1f}%)")
-                print(f"     🟡 Good (-70 to -85dBm): {good:,}/{len(all_rssi):,} ({good/len(all_rssi)*100:.1f}%)")
-                print(f"     🟠 Fair (-85 to -100dBm): {fair:,}/{len(all_rssi):,} ({fair/len(all_rssi)*100:.1f}%)")
-                print(f"     🔴 Poor (<-100dBm): {poor:,}/{len(all_rssi):,} ({poor/len(all_rssi)*100:.1f}%)")
+                print(f"     🟢 Excellent (≥-70dBm): {excellent:,}/{rssi_count:,} ({excellent/rssi_count*100:.1f}%)")
+                print(f"     🟡 Good (-70 to -85dBm): {good:,}/{rssi_count:,} ({good/rssi_count*100:.1f}%)")
+                print(f"     🟠 Fair (-85 to -100dBm): {fair:,}/{rssi_count:,} ({fair/rssi_count*100:.1f}%)")
+                print(f"     🔴 Poor (<-100dBm): {poor:,}/{rssi_count:,} ({poor/rssi_count*100:.1f}%)")
             
-            if all_snr:
-                avg_snr = sum(all_snr) / len(all_snr)
-                min_snr = min(all_snr)
-                max_snr = max(all_snr)
+            if all_snr.count:
+                avg_snr = all_snr.mean
+                min_snr = all_snr.minimum
+                max_snr = all_snr.maximum
                 print(f"\n📊 SNR Analysis:")
                 print(f"   Average SNR: {avg_snr:.1f}dB")
                 print(f"   SNR Range: {min_snr}dB to {max_snr}dB")
@@ -470,26 +831,46 @@ class RAK3172ImageReceiver:
             
             # Environmental recommendations
             print(f"\n💡 Recommendations:")
-            if all_rssi and avg_rssi < -90:
+            if all_rssi.count and avg_rssi < -90:
                 print(f"   • Consider moving devices closer together")
                 print(f"   • Check for obstacles between transmitter and receiver")
                 print(f"   • Try repositioning antennas for better line of sight")
-            elif all_rssi and max_rssi - min_rssi > 15:
+            elif all_rssi.count and max_rssi - min_rssi > 15:
                 print(f"   • Signal varies significantly - check for interference")
                 print(f"   • Consider stabilizing device positions")
             else:
                 print(f"   • Signal quality is good for current setup")
                 print(f"   • Current distance and positioning work well")
     
+    def flush_saves(self):
+        """Wait for queued images to be saved, then stop the writer thread (only the first call does anything)"""
+        if self._saves_flushed:
+            return
+        self._saves_flushed = True
+        self._save_q.put(None)
+        self._writer_thread.join(timeout=10)
+    
     def cleanup(self):
         """Clean up resources"""
         self.running = False
+        self._reader_running = False
+        if self._reader_thread:
+            self._reader_thread.join(timeout=2)
+        
+        # Let queued saves finish before exiting
+        self.flush_saves()
         if self.connection:
             self.connection.close()
 
 
 def main():
     """Main receiver application"""
+    # Redirected to a log file or pipe, stdout may use a legacy code page - emit UTF-8 instead
+    try:
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    except AttributeError:
+        pass
+    
     print("📡 RAK3172 LoRa Image Receiver - FIXED for Large Images")
     print("=" * 60)
     
@@ -511,7 +892,8 @@ def main():
         print("\n🛑 Receiver stopped by user")
     
     finally:
-        # Print final statistics
+        # Print final statistics once queued images are saved and counted
+        receiver.flush_saves()
         receiver.print_statistics()
         receiver.cleanup()
         print("✅ Receiver cleanup completed")
@@ -12,22 +12,283 @@ import struct
 import numpy as np
 from datetime import datetime
 import os
-import glob
+import sys
+import binascii
+import zlib
+import itertools
+import functools
+import logging
+import selectors
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+# Optional: libjpeg-turbo bindings for faster JPEG encode (falls back to OpenCV)
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJPF_GRAY, TJSAMP_420, TJSAMP_422, TJSAMP_444, TJSAMP_GRAY
+    _TJ_SUBSAMPLE = {'420': TJSAMP_420, '422': TJSAMP_422, '444': TJSAMP_444}
+except ImportError:
+    TurboJPEG = None
+
+# Per-image chatter in multi-image loops - shown only in verbose mode (DEBUG), see _cmd_verbose
+_log = logging.getLogger("lora_tx")
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic variants)
+_JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+
+# Most header bytes (tables, SOF) a JPEG may keep before its scan data and still be sent as-is
+_PASSTHROUGH_HEADER_LIMIT = 2048
+
+
+def _exif_orientation(payload):
+    """EXIF Orientation tag (1-8) from an APP1 segment payload, or None if there isn't one"""
+    if payload[:6] != b'Exif\x00\x00':
+        return None
+    tiff = payload[6:]
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    try:
+        ifd = struct.unpack_from(endian + 'I', tiff, 4)[0]
+        count = struct.unpack_from(endian + 'H', tiff, ifd)[0]
+        for k in range(count):
+            # tag, type, count, then a SHORT value sits in the first 2 bytes of the value field
+            tag, _, _, value = struct.unpack_from(endian + 'HHIH', tiff, ifd + 2 + 12 * k)
+            if tag == 0x0112:
+                return value
+    except struct.error:
+        pass
+    return None
+
+
+def _image_dimensions(file_path):
+    """
+    Read (width, height) from a JPEG, PNG or BMP header without decoding the image
+    JPEG sizes follow the EXIF orientation like cv2.imread does (width/height swapped for 5-8)
+    Returns None for other formats or if the header can't be parsed
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(26)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:2] == b'BM' and len(head) == 26 and int.from_bytes(head[14:18], 'little') >= 40:
+            width, height = struct.unpack('<ii', head[18:26])
+            return width, abs(height)  # negative height = top-down rows
+        if head[:2] != b'\xff\xd8':
+            return None
+        
+        # Walk the JPEG segments up to SOF, seeking over payloads (EXIF thumbnails can be large)
+        f.seek(2)
+        orientation = None
+        while True:
+            marker_bytes = f.read(2)
+            if len(marker_bytes) < 2 or marker_bytes[0] != 0xFF:
+                return None
+            marker = marker_bytes[1]
+            if marker == 0xFF:  # fill byte
+                f.seek(-1, os.SEEK_CUR)
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # markers without a length field
+                continue
+            if marker in (0xD9, 0xDA):  # end of image / start of scan - no SOF before it
+                return None
+            
+            # length(2) precision(1) height(2) width(2)
+            segment = f.read(7)
+            if len(segment) < 7:
+                return None
+            if marker in _JPEG_SOF_MARKERS:
+                height, width = struct.unpack('>HH', segment[3:7])
+                if orientation in (5, 6, 7, 8):  # rotated 90/270 - decoders return it transposed
+                    return height, width
+                return width, height
+            segment_length = int.from_bytes(segment[:2], 'big')
+            if marker == 0xE1 and orientation is None:
+                orientation = _exif_orientation(segment[2:] + f.read(segment_length - 7))
+            else:
+                f.seek(segment_length - 7, os.SEEK_CUR)
+
+
+def _strip_jpeg_metadata(data):
+    """
+    Drop APP1-APP15 and COM segments (EXIF, thumbnails, ICC, XMP, comments) before the first scan
+    A bare JFIF APP0 and the Adobe APP14 colour-transform flag are kept - decoders read them
+    Returns (stripped bytes, header bytes kept, EXIF orientation or None), or None if unparsable
+    """
+    parts = [data[:2]]
+    kept = 2
+    orientation = None
+    i = 2
+    size = len(data)
+    while i + 4 <= size and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0xDA:  # start of scan - entropy-coded data and the rest go through untouched
+            parts.append(data[i:])
+            return b''.join(parts), kept, orientation
+        segment_length = int.from_bytes(data[i + 2:i + 4], 'big')
+        segment = data[i:i + 2 + segment_length]
+        if marker == 0xE1 and orientation is None:
+            orientation = _exif_orientation(segment[4:])
+        drop = (marker == 0xFE or 0xE1 <= marker <= 0xEF) and not (
+            marker == 0xEE and segment[4:9] == b'Adobe')
+        if marker == 0xE0 and segment_length > 16:  # JFIF/JFXX carrying a thumbnail
+            drop = True
+        if not drop:
+            parts.append(segment)
+            kept += len(segment)
+        i += 2 + segment_length
+    return None
+
+
+class TxRecord(NamedTuple):
+    """Result of one send_image call"""
+    image_id: str
+    start_time: float
+    end_time: float
+    duration: float
+    image_size: int
+    total_fragments: int
+    successful_fragments: int
+    success_rate: float
+    timestamp: str
+    airtime: float = 0.0  # seconds on air for all of the image's packets
+
+
+# Sum of the IJG (libjpeg) standard luminance quantization table at quality 50
+_IJG_LUMA_SUM = 3688
+
+
+def _jpeg_quality(data):
+    """
+    Estimate the IJG quality setting (1-100) of JPEG bytes from their luminance quantization table
+    Returns None if the data has no 8-bit table 0 before the image data
+    """
+    i = 2
+    size = len(data)
+    while i + 4 <= size and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker in (0xD9, 0xDA):  # end of image / start of scan
+            return None
+        segment_length = int.from_bytes(data[i + 2:i + 4], 'big')
+        if marker == 0xDB:
+            # A DQT segment can hold several tables: precision/id byte + 64 (8-bit) or 128 (16-bit) values
+            j = i + 4
+            end = min(i + 2 + segment_length, size)
+            while j < end:
+                precision, table_id = data[j] >> 4, data[j] & 0x0F
+                if precision == 0 and table_id == 0:
+                    # Tables are the standard one scaled by the quality factor (libjpeg's jpeg_quality_scaling)
+                    scale = sum(data[j + 1:j + 65]) * 100 / _IJG_LUMA_SUM
+                    return round((200 - scale) / 2 if scale <= 100 else 5000 / scale)
+                j += 1 + (128 if precision else 64)
+        i += 2 + segment_length
+    return None
+
+
+# P2P radio settings sent by setup_rak3172_transmitter (also used to pace packets by airtime)
+_LORA_SF = 7            # spreading factor
+_LORA_BW = 125000       # bandwidth, Hz
+_LORA_CR = 1            # coding rate 4/(4+CR)
+_LORA_PREAMBLE = 8      # preamble symbols
+
+
+def _lora_airtime(payload_len, sf=_LORA_SF, bw=_LORA_BW, cr=_LORA_CR, preamble=_LORA_PREAMBLE):
+    """Time on air in seconds of one LoRa packet (explicit header, CRC on - Semtech AN1200.13)"""
+    t_sym = (1 << sf) / bw
+    low_dr = 1 if t_sym > 0.016 else 0  # low data rate optimisation (SF11/12 at 125kHz)
+    payload_symbols = 8 + max(-(-(8 * payload_len - 4 * sf + 28 + 16) // (4 * (sf - 2 * low_dr))) * (cr + 4), 0)
+    return (preamble + 4.25 + payload_symbols) * t_sym
+
+
+def _safe_cmd(label="Error", hint=None):
+    """REPL command decorator - report an exception and return to the prompt instead of raising"""
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(self, arg):
+            try:
+                return handler(self, arg)
+            except Exception as e:
+                print(f"❌ {label}: {e}")
+                if hint:
+                    print(hint)
+        return wrapper
+    return decorate
+
 
 class RAK3172ImageTransmitter:
     """
     Dedicated transmitter for RAK3172 LoRa image transmission
     FIXED: Support for large images (>65KB)
     """
+    # Packet layouts: type(1) + image_id(8) + fields, compiled once instead of per packet
+    _START_STRUCT = struct.Struct('<c8sIId')   # total_size, total_fragments, start timestamp
+    _FRAG_STRUCT = struct.Struct('<c8sIIHI')    # fragment_id, total_fragments, data_length, crc32 (+ data)
+    _PARITY_STRUCT = struct.Struct('<c8sHHHI')  # parity_id, parity_count, data_length, crc32 (+ data)
+    _END_STRUCT = struct.Struct('<c8sd')       # end timestamp
+    
+    # AT+PSEND framing around the hex payload, pre-encoded
+    _PSEND_PREFIX = b"AT+PSEND="
+    _CRLF = b"\r\n"
+    
     def __init__(self, serial_port, baud_rate=115200, camera_index=0):
         self.serial_port = serial_port
         self.baud_rate = baud_rate
+        self.fast_baud_rate = None  # e.g. 921600 - switch the module UART up after setup (restored on cleanup)
         self.camera_index = camera_index
         self.connection = None
+        self._selector = None  # waits on the serial fd for module responses (POSIX only)
+        self._tx_confirmed = False  # last send_rak_packet saw +EVT:TXP2P (packet fully on air)
+        self._last_tx_monotonic = 0.0  # when the last AT+PSEND was written
+        self._last_tx_airtime = 0.0    # its time on air at the configured SF/BW
+        self._airtime_total = 0.0      # on-air seconds of every packet sent so far
+        
+        # Regional duty-cycle limit, e.g. 0.01 for the 1% EU868 sub-bands (None = not enforced, see 'duty').
+        # Multi-image sends wait long enough after each image to stay within it
+        self.duty_cycle = None
         self.camera = None
         self.camera_initialized = False
-        self.transmission_log = []
+        self._frame_buf = None  # camera frames are read into this array instead of a new one each capture
+        self._capturer = None   # single long-lived thread that owns all camera reads (see request_capture)
+        # Running totals for print_statistics, updated as each transmission is logged
+        self._tx_count = 0
+        self._tx_total_duration = 0.0
+        self._tx_total_success = 0.0
+        self._tx_total_size = 0
+        self._pkt_buf = bytearray(256)  # fragment packets are assembled here, reused for every fragment
         self.image_folder = "test_images"  # Folder for pre-captured images
+        self._probe_cache = {}  # path -> ((st_size, st_mtime_ns), probe) from the last folder scan
+        
+        # Captured files are named session start + counter (wall-clock formatted once, not per capture)
+        self._session_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._capture_counter = itertools.count(1)
+        
+        # XOR parity fragments sent after each image (0 = off). Parity j covers
+        # fragments j, j+N, j+2N... so the receiver can rebuild one lost fragment per group
+        self.parity_fragments = 8
+        
+        # True = a line per fragment; otherwise progress is written every 16 packets or once a second
+        self.verbose = False
+        self._progress_time = 0.0
+        
+        # False = send grayscale JPEGs - no chroma planes, typically a third smaller on air
+        self.colour = True
+        
+        # Chroma subsampling for colour JPEGs: '420' (smallest), '422' or '444' (full chroma, larger)
+        self.jpeg_subsample = '420'
+        
+        # Fast JPEG encoder, if PyTurboJPEG and libturbojpeg are available
+        self._jpeg = None
+        if TurboJPEG is not None:
+            try:
+                self._jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"⚠️  TurboJPEG unavailable, using OpenCV encoder: {e}")
         
         # Create test images folder if it doesn't exist
         os.makedirs(self.image_folder, exist_ok=True)
@@ -40,15 +301,25 @@ class RAK3172ImageTransmitter:
             self.connection = serial.Serial(
                 port=self.serial_port,
                 baudrate=self.baud_rate,
-                timeout=1,
+                timeout=0.1,  # short so read_tx_response() can react quickly where select isn't available
+                write_timeout=2,  # each AT command is one write; fail the packet rather than hang on a stuck port
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 bytesize=serial.EIGHTBITS
             )
+            self._selector = self._open_selector()
+            
+            # Larger driver buffers so a whole AT+PSEND line is queued in one write (Windows only)
+            if hasattr(self.connection, 'set_buffer_size'):
+                self.connection.set_buffer_size(rx_size=16384, tx_size=16384)
             
             # Setup RAK3172 for transmission
             self.setup_rak3172_transmitter()
             
+            # Optional faster UART - uploading each hex-encoded PSEND takes ~8x less time at 921600
+            if self.fast_baud_rate and self.fast_baud_rate != self.baud_rate:
+                self.switch_baud_rate(self.fast_baud_rate)
+            
             print(f"✅ LoRa transmitter ready on {self.serial_port}")
             
             # Initialize camera only if requested
@@ -79,6 +350,7 @@ class RAK3172ImageTransmitter:
             actual_height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
             print(f"✅ Camera initialized: {actual_width}x{actual_height}")
             
+            self._frame_buf = np.empty((actual_height, actual_width, 3), dtype=np.uint8)
             self.camera_initialized = True
             return True
             
@@ -91,25 +363,22 @@ class RAK3172ImageTransmitter:
         print("🔧 Configuring RAK3172 for transmission...")
         
         # Stop any existing RX mode
-        self.connection.write(b"AT+PRECV=0\r\n")
-        time.sleep(1)
-        response = self.connection.read_all().decode().strip()
+        self._at("AT+PRECV=0", timeout=1)
         
         # Configure P2P parameters
         setup_commands = [
             ("AT+NWM=0", "Set to LoRa P2P mode"),
             ("AT+PFREQ=868000000", "Set frequency to 868MHz"),
-            ("AT+PSF=7", "Set spreading factor to 7 (faster)"),
-            ("AT+PBW=125", "Set bandwidth to 125kHz"),
-            ("AT+PCR=1", "Set coding rate to 4/5"),
-            ("AT+PPL=8", "Set preamble length to 8"),
+            (f"AT+PSF={_LORA_SF}", f"Set spreading factor to {_LORA_SF}"),
+            (f"AT+PBW={_LORA_BW // 1000}", f"Set bandwidth to {_LORA_BW // 1000}kHz"),
+            (f"AT+PCR={_LORA_CR}", f"Set coding rate to 4/{4 + _LORA_CR}"),
+            (f"AT+PPL={_LORA_PREAMBLE}", f"Set preamble length to {_LORA_PREAMBLE}"),
             ("AT+PTP=20", "Set TX power to 20dBm"),
         ]
         
         for cmd, description in setup_commands:
-            self.connection.write(f"{cmd}\r\n".encode())
-            time.sleep(0.8)
-            response = self.connection.read_all().decode().strip()
+            # Returns as soon as the module answers - 0.8s is only the upper bound now
+            response = self._at(cmd)
             
             if "OK" in response or response == "":
                 print(f"✅ {description}")
@@ -118,18 +387,39 @@ class RAK3172ImageTransmitter:
         
         print("✅ RAK3172 configured for transmission")
     
+    def switch_baud_rate(self, baud_rate):
+        """
+        Move the module UART and our serial port to another baud rate (AT+BAUD)
+        Returns to the previous rate if the module doesn't answer at the new one
+        """
+        old_rate = self.connection.baudrate
+        response = self._at(f"AT+BAUD={baud_rate}")
+        if "OK" not in response:
+            print(f"⚠️  Module rejected baud rate {baud_rate}: {response}")
+            return False
+        
+        self.connection.baudrate = baud_rate
+        self.connection.reset_input_buffer()
+        if "OK" in self._at("AT", timeout=0.5):
+            print(f"✅ Serial link now at {baud_rate} baud")
+            return True
+        
+        print(f"⚠️  No answer at {baud_rate} baud, going back to {old_rate}")
+        self.connection.baudrate = old_rate
+        return False
+    
     def send_test_string(self, message):
         """Send a simple text string for testing LoRa connection"""
         try:
             print(f"🧪 Testing connection with message: '{message}'")
             
             # Convert message to hex (same as RAK3172 format)
-            hex_message = message.encode('utf-8').hex().upper()
+            hex_message = binascii.b2a_hex(message.encode('utf-8')).upper()
             
             # Send using AT+PSEND
-            cmd = f"AT+PSEND={hex_message}\r\n"
-            self.connection.write(cmd.encode())
-            print(f"📤 Sent test string (hex: {hex_message})")
+            cmd = b"AT+PSEND=" + hex_message + b"\r\n"
+            self.connection.write(cmd)
+            print(f"📤 Sent test string (hex: {hex_message.decode()})")
             
             # Wait for transmission confirmation
             time.sleep(2)
@@ -157,10 +447,14 @@ class RAK3172ImageTransmitter:
             print(f"❌ Test transmission failed: {e}")
             return False
     
-    def capture_image(self, quality=50, target_size=None):
+    def capture_image(self, quality=50, target_size=None, colour=None):
         """
         Capture image from camera with smart resizing for LoRa transmission
+        colour=False encodes grayscale (defaults to self.colour)
         """
+        if colour is None:
+            colour = self.colour
+        
         if not self.camera_initialized:
             print("🎥 Camera not initialized. Initializing now...")
             if not self.initialize_camera():
@@ -169,9 +463,11 @@ class RAK3172ImageTransmitter:
         if not self.camera or not self.camera.isOpened():
             raise Exception("Camera not available")
         
-        ret, frame = self.camera.read()
+        # Read into the preallocated frame (OpenCV reallocates it only if the camera size changed)
+        ret, frame = self.camera.read(self._frame_buf)
         if not ret:
             raise Exception("Failed to capture image")
+        self._frame_buf = frame
         
         original_size = (frame.shape[1], frame.shape[0])
         print(f"📸 Original image: {original_size[0]}x{original_size[1]}")
@@ -200,21 +496,53 @@ class RAK3172ImageTransmitter:
                 frame_resized = frame
                 print(f"📏 Keeping original size: {original_size[0]}x{original_size[1]}")
         
-        # Convert to JPEG with specified quality
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-        ret, buffer = cv2.imencode('.jpg', frame_resized, encode_param)
+        if not colour:
+            frame_resized = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
         
-        if not ret:
-            raise Exception("Failed to encode image")
+        # Convert to JPEG with specified quality
+        buffer = self.encode_jpeg(frame_resized, quality)
         
         final_size = len(buffer)
         print(f"📦 Final size: {final_size} bytes (quality: {quality}%)")
         
         # Estimate transmission time
-        estimated_fragments = (final_size + 165) // 165  # ~165 bytes per fragment
+        chunk = self.chunk_size()
+        estimated_fragments = (final_size + chunk - 1) // chunk  # chunk_size() image bytes per fragment
         estimated_time = estimated_fragments * 1.8  # ~1.8s per fragment
         print(f"⏱️  Estimated transmission: ~{estimated_time:.1f}s ({estimated_fragments} fragments)")
         
+        return buffer
+    
+    def request_capture(self, quality=50, target_size=None, colour=None):
+        """
+        Queue capture_image on the dedicated capture thread and return its Future
+        One worker for the transmitter's lifetime: the camera is only ever read from that thread
+        """
+        if self._capturer is None:
+            self._capturer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+        return self._capturer.submit(self.capture_image, quality, target_size, colour)
+    
+    def encode_jpeg(self, image, quality):
+        """Encode a BGR (or 2-D grayscale) image to JPEG bytes - libjpeg-turbo when available, else OpenCV"""
+        if self._jpeg is not None:
+            try:
+                if image.ndim == 2:
+                    return self._jpeg.encode(image[:, :, np.newaxis], quality=quality, pixel_format=TJPF_GRAY,
+                                             jpeg_subsample=TJSAMP_GRAY)
+                return self._jpeg.encode(image, quality=quality, pixel_format=TJPF_BGR,
+                                         jpeg_subsample=_TJ_SUBSAMPLE[self.jpeg_subsample])
+            except Exception as e:
+                print(f"⚠️  TurboJPEG encode failed ({e}), retrying with OpenCV")
+        
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        sampling = getattr(cv2, f"IMWRITE_JPEG_SAMPLING_FACTOR_{self.jpeg_subsample}", None)  # OpenCV >= 4.5.5
+        if image.ndim == 3 and sampling is not None:
+            encode_param += [int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR), int(sampling)]
+        ret, buffer = cv2.imencode('.jpg', image, encode_param)
+        
+        if not ret:
+            raise Exception("Failed to encode image")
+        
         return buffer.tobytes()
     
     def print_help(self, command=None):
@@ -228,7 +556,11 @@ class RAK3172ImageTransmitter:
             print("  scan          - Scan and analyze images in current folder")
             print("  original      - Send image at ORIGINAL resolution")
             print("  batch         - Send multiple images sequentially")
-            print("  send          - Capture and send from camera")
+            print("  send [n]      - Capture and send n images from camera (default 1)")
+            print("  gray          - Toggle grayscale JPEGs (smaller, faster to send)")
+            print("  subsample     - Set chroma subsampling: 420 (default), 422 or 444")
+            print("  duty          - Set duty-cycle limit in % between images, or 'duty off' (default)")
+            print("  verbose       - Toggle per-fragment output")
             print("  stats         - Show transmission statistics")
             print("  quit          - Exit program")
             print("\nType 'help <command>' for detailed information")
@@ -300,7 +632,7 @@ class RAK3172ImageTransmitter:
             print("  • Send range of images automatically")
             print("  • Choose start and end image numbers")
             print("  • Select quality and resolution mode")
-            print("  • 5-second delay between images")
+            print("  • Waits out the duty-cycle off time between images when 'duty' is set")
             print("  • Shows progress for each image")
             print("Process:")
             print("  1. Scans folder and shows all images")
@@ -388,7 +720,7 @@ class RAK3172ImageTransmitter:
             print(f"❌ No help available for '{command}'")
             print("Available help topics: folder, scan, original, batch, test, send-folder-image, resize-image-res")
     
-    def load_image_file_original(self, file_path, quality=85):
+    def load_image_file_original(self, file_path, quality=85, colour=None):
         """
         Load an existing image file at ORIGINAL resolution for LoRa transmission
         NO RESIZING - sends exactly as captured
@@ -396,40 +728,46 @@ class RAK3172ImageTransmitter:
         Args:
             file_path: Path to the image file
             quality: JPEG quality for compression only (1-100)
+            colour: False to send grayscale, None for self.colour
         """
+        if colour is None:
+            colour = self.colour
+        
         if not os.path.exists(file_path):
             raise Exception(f"Image file not found: {file_path}")
         
-        # Load image
-        image = cv2.imread(file_path)
-        if image is None:
-            raise Exception(f"Could not load image: {file_path}")
+        # Load image - a suitable JPEG is sent as-is, anything else is decoded for re-encoding
+        buffer = self._read_jpeg_passthrough(file_path, quality, colour)
+        if buffer is not None:
+            original_size = _image_dimensions(file_path) or (0, 0)
+        else:
+            image = cv2.imread(file_path, cv2.IMREAD_COLOR if colour else cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise Exception(f"Could not load image: {file_path}")
+            original_size = (image.shape[1], image.shape[0])
         
-        original_size = (image.shape[1], image.shape[0])
         print(f"📂 Loaded: {os.path.basename(file_path)}")
         print(f"📏 ORIGINAL Resolution: {original_size[0]}x{original_size[1]} pixels")
         print(f"🎯 NO RESIZING - Sending at full resolution")
         
         # Encode to JPEG at specified quality - NO RESIZING
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-        ret, buffer = cv2.imencode('.jpg', image, encode_param)
-        
-        if not ret:
-            raise Exception("Failed to encode image")
+        if buffer is None:
+            buffer = self.encode_jpeg(image, quality)
         
         final_size = len(buffer)
         print(f"📦 Final size: {final_size:,} bytes (quality: {quality}%)")
         
         # Calculate realistic transmission estimates
-        estimated_fragments = (final_size + 165) // 165
+        chunk = self.chunk_size()
+        estimated_fragments = (final_size + chunk - 1) // chunk
         estimated_time = estimated_fragments * 1.8
         
         print(f"⏱️  Estimated transmission: ~{estimated_time/60:.1f} minutes ({estimated_fragments} fragments)")
         print(f"📊 Data rate: ~{(final_size*8)/(estimated_time*1000):.2f} Kbps")
         
-        return buffer.tobytes()
+        return buffer
     
-    def load_image_file(self, file_path, quality=60, target_size=None):
+    def load_image_file(self, file_path, quality=60, target_size=None, colour=None, report=print):
         """
         Load an existing image file and prepare it for LoRa transmission
         UNIFIED METHOD FOR ALL IMAGE SENDING - Fixed target_pixels
@@ -438,22 +776,30 @@ class RAK3172ImageTransmitter:
             file_path: Path to the image file
             quality: JPEG quality for compression (1-100)
             target_size: Target resolution tuple (width, height) or None for auto
+            colour: False to send grayscale, None for self.colour
+            report: Called with each progress message (print by default)
         """
+        if colour is None:
+            colour = self.colour
+        
         if not os.path.exists(file_path):
             raise Exception(f"Image file not found: {file_path}")
         
-        # Load image
-        image = cv2.imread(file_path)
-        if image is None:
-            raise Exception(f"Could not load image: {file_path}")
+        # Header dimensions let the decode happen after we know the output size (see _read_image_scaled)
+        image = None
+        original_size = _image_dimensions(file_path)
+        if original_size is None:
+            image = cv2.imread(file_path, cv2.IMREAD_COLOR if colour else cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise Exception(f"Could not load image: {file_path}")
+            original_size = (image.shape[1], image.shape[0])
         
-        original_size = (image.shape[1], image.shape[0])
-        print(f"📂 Loaded image: {os.path.basename(file_path)} ({original_size[0]}x{original_size[1]})")
+        report(f"📂 Loaded image: {os.path.basename(file_path)} ({original_size[0]}x{original_size[1]})")
         
         # Apply resizing logic
         if target_size:
-            image_resized = cv2.resize(image, target_size)
-            print(f"📏 Resized to: {target_size[0]}x{target_size[1]}")
+            new_size = tuple(target_size)
+            report(f"📏 Resized to: {target_size[0]}x{target_size[1]}")
         else:
             # FIXED: Use 640*480 as target_pixels (same as your modification)
             target_pixels = 640 * 480  # 307,200 pixels for good balance
@@ -465,28 +811,97 @@ class RAK3172ImageTransmitter:
                 new_height = int(original_size[1] * scale)
                 new_width = new_width - (new_width % 2)
                 new_height = new_height - (new_height % 2)
-                image_resized = cv2.resize(image, (new_width, new_height))
-                print(f"📏 Auto-resized to: {new_width}x{new_height} (scale: {scale:.2f})")
+                new_size = (new_width, new_height)
+                report(f"📏 Auto-resized to: {new_width}x{new_height} (scale: {scale:.2f})")
+            else:
+                new_size = tuple(original_size)
+                report(f"📏 Keeping original size: {original_size[0]}x{original_size[1]}")
+        
+        # No resize needed - a suitable JPEG is sent as-is
+        buffer = None
+        if image is None and new_size == tuple(original_size):
+            buffer = self._read_jpeg_passthrough(file_path, quality, colour, report)
+        
+        if buffer is None:
+            if image is None:
+                image = self._read_image_scaled(file_path, original_size, new_size, colour)
+            if (image.shape[1], image.shape[0]) != new_size:
+                image_resized = cv2.resize(image, new_size)
             else:
                 image_resized = image
-                print(f"📏 Keeping original size: {original_size[0]}x{original_size[1]}")
-        
-        # Encode to JPEG
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-        ret, buffer = cv2.imencode('.jpg', image_resized, encode_param)
-        
-        if not ret:
-            raise Exception("Failed to encode image")
+            
+            # Encode to JPEG
+            buffer = self.encode_jpeg(image_resized, quality)
         
         final_size = len(buffer)
-        print(f"📦 Final size: {final_size} bytes (quality: {quality}%)")
+        report(f"📦 Final size: {final_size} bytes (quality: {quality}%)")
         
         # Estimate transmission time
-        estimated_fragments = (final_size + 165) // 165
+        chunk = self.chunk_size()
+        estimated_fragments = (final_size + chunk - 1) // chunk
         estimated_time = estimated_fragments * 1.8
-        print(f"⏱️  Estimated transmission: ~{estimated_time/60:.1f} minutes ({estimated_fragments} fragments)")
+        report(f"⏱️  Estimated transmission: ~{estimated_time/60:.1f} minutes ({estimated_fragments} fragments)")
         
-        return buffer.tobytes()
+        return buffer
+    
+    def _read_jpeg_passthrough(self, file_path, quality, colour=True, report=print):
+        """
+        Return the file's bytes if it is a colour JPEG already at or below the requested quality -
+        re-encoding it would cost a full decode/encode and only lose detail. Otherwise None
+        Metadata segments are dropped first: on air every byte costs airtime
+        """
+        if not colour:
+            return None
+        
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        if raw[:3] != b'\xff\xd8\xff':
+            return None
+        
+        source_quality = _jpeg_quality(raw)
+        if source_quality is None or source_quality > quality:
+            return None
+        
+        stripped = _strip_jpeg_metadata(raw)
+        if stripped is None:
+            return None
+        data, header_size, orientation = stripped
+        # Rotated images are re-encoded upright - the orientation tag goes with the EXIF segment
+        if orientation not in (None, 1) or header_size > _PASSTHROUGH_HEADER_LIMIT:
+            return None
+        
+        report(f"📦 Source is a JPEG at quality ~{source_quality}% - sending it without re-encoding")
+        if len(data) < len(raw):
+            report(f"✂️  Dropped {len(raw) - len(data):,} bytes of metadata (EXIF/ICC/comments)")
+        return data
+    
+    def _read_image_scaled(self, file_path, original_size, new_size, colour=True):
+        """
+        Decode a JPEG at the largest 1/2, 1/4 or 1/8 reduction that still covers new_size -
+        libjpeg scales in the DCT domain, so most of the IDCT and the full-size buffer are skipped
+        """
+        if colour:
+            flag = cv2.IMREAD_COLOR
+            reduced_flags = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                             (2, cv2.IMREAD_REDUCED_COLOR_2))
+        else:
+            # Grayscale decode skips the chroma planes entirely
+            flag = cv2.IMREAD_GRAYSCALE
+            reduced_flags = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                             (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+        
+        with open(file_path, 'rb') as f:
+            is_jpeg = f.read(2) == b'\xff\xd8'
+        if is_jpeg:
+            for factor, reduced_flag in reduced_flags:
+                if original_size[0] // factor >= new_size[0] and original_size[1] // factor >= new_size[1]:
+                    flag = reduced_flag
+                    break
+        
+        image = cv2.imread(file_path, flag)
+        if image is None:
+            raise Exception(f"Could not load image: {file_path}")
+        return image
     
     def scan_image_folder(self, folder_path=None):
         """
@@ -508,17 +923,10 @@ class RAK3172ImageTransmitter:
             else:
                 return []
         
-        image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tiff', '*.tif']
-        image_files = []
-        
         print(f"🔍 Scanning folder: {os.path.abspath(folder_path)}")
         
-        for ext in image_extensions:
-            image_files.extend(glob.glob(os.path.join(folder_path, ext)))
-            image_files.extend(glob.glob(os.path.join(folder_path, ext.upper())))
-        
-        # Remove duplicates and sort
-        image_files = sorted(list(set(image_files)))
+        file_stats = self._list_image_files(folder_path, with_stats=True)
+        image_files = [file_path for file_path, _ in file_stats]
         
         print(f"📊 Found {len(image_files)} images in folder")
         
@@ -530,26 +938,25 @@ class RAK3172ImageTransmitter:
         print(f"\n📋 Image Details:")
         print("-" * 80)
         
+        # Reuse a file's last probe while its size and mtime are unchanged (an overwrite updates them)
+        cache = self._probe_cache
+        stale = [file_path for file_path, key in file_stats
+                 if file_path not in cache or cache[file_path][0] != key]
+        if stale:
+            # Probe files in parallel - header reads are I/O bound and cv2 releases the GIL
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as pool:
+                fresh = dict(zip(stale, pool.map(self._probe_image, stale)))
+        else:
+            fresh = {}
+        self._probe_cache = {file_path: (key, fresh[file_path] if file_path in fresh else cache[file_path][1])
+                             for file_path, key in file_stats}
+        probes = [self._probe_cache[file_path][1] for file_path in image_files]
+        
         total_size = 0
-        for i, file_path in enumerate(image_files):
+        for i, (file_path, (file_size, dimensions, megapixels)) in enumerate(zip(image_files, probes)):
             filename = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path)
             total_size += file_size
             
-            # Get image dimensions
-            try:
-                temp_img = cv2.imread(file_path)
-                if temp_img is not None:
-                    height, width = temp_img.shape[:2]
-                    dimensions = f"{width}x{height}"
-                    megapixels = (width * height) / 1000000
-                else:
-                    dimensions = "Unknown"
-                    megapixels = 0
-            except:
-                dimensions = "Error"
-                megapixels = 0
-            
             print(f"{i:2d}: {filename:<25} {file_size/1024:8.1f}KB  {dimensions:>10}  {megapixels:.1f}MP")
         
         print("-" * 80)
@@ -558,20 +965,53 @@ class RAK3172ImageTransmitter:
         # Estimate total transmission time
         if len(image_files) > 0:
             avg_size = total_size / len(image_files)
-            est_time_per_image = (avg_size * 8) / (165 * 1.8 * 1000)  # Rough estimate
+            chunk = self.chunk_size()
+            est_time_per_image = (avg_size + chunk - 1) // chunk * 1.8  # ~1.8s per fragment
             total_est_time = est_time_per_image * len(image_files)
             print(f"⏱️  Estimated total transmission time: ~{total_est_time/60:.1f} minutes")
         
         return image_files
     
+    def _probe_image(self, file_path):
+        """Return (file_size, dimensions text, megapixels) for one image file"""
+        file_size = os.path.getsize(file_path)
+        
+        # Get image dimensions - from the file header when possible, full decode only as a fallback
+        try:
+            size = _image_dimensions(file_path)
+            if size is None:
+                temp_img = cv2.imread(file_path)
+                if temp_img is not None:
+                    size = (temp_img.shape[1], temp_img.shape[0])
+            if size is not None:
+                width, height = size
+                return file_size, f"{width}x{height}", (width * height) / 1000000
+            return file_size, "Unknown", 0
+        except Exception:
+            return file_size, "Error", 0
+    
+    def _list_image_files(self, folder_path, image_extensions=('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'),
+                          with_stats=False):
+        """
+        Sorted image paths in folder_path - one directory listing, extensions matched case-insensitively
+        with_stats=True returns (path, (st_size, st_mtime_ns)) pairs taken from the same listing
+        """
+        if not os.path.isdir(folder_path):
+            return []
+        with os.scandir(folder_path) as entries:
+            if not with_stats:
+                return sorted(entry.path for entry in entries
+                              if entry.name.lower().endswith(image_extensions) and entry.is_file())
+            files = []
+            for entry in entries:
+                if entry.name.lower().endswith(image_extensions) and entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.path, (stat.st_size, stat.st_mtime_ns)))
+            return sorted(files)
+    
     def list_available_images(self):
         """List all available images in the test folder"""
-        image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tiff']
-        image_files = []
-        
-        for ext in image_extensions:
-            image_files.extend(glob.glob(os.path.join(self.image_folder, ext)))
-            image_files.extend(glob.glob(os.path.join(self.image_folder, ext.upper())))
+        image_files = self._list_image_files(self.image_folder, ('.jpg', '.jpeg', '.png', '.bmp', '.tiff'))
         
         if not image_files:
             print(f"📁 No images found in '{self.image_folder}' folder")
@@ -589,7 +1029,7 @@ class RAK3172ImageTransmitter:
     def save_captured_image(self, image_data, filename=None):
         """Save a captured image to the test folder for later use"""
         if filename is None:
-            filename = f"captured_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+            filename = f"captured_{self._session_stamp}_{next(self._capture_counter):03d}.jpg"
         
         filepath = os.path.join(self.image_folder, filename)
         
@@ -605,21 +1045,63 @@ class RAK3172ImageTransmitter:
             print(f"❌ Failed to save image")
             return None
     
-    def send_rak_packet(self, data_hex):
-        """Send a single packet via RAK3172 with enhanced error handling"""
+    def read_tx_response(self, timeout=1.5):
+        """
+        Collect module output after AT+PSEND until the packet is on air (+EVT:TXP2P)
+        or an error is reported, at most timeout seconds - replaces a fixed sleep
+        """
+        return self._read_until((b"+EVT:TXP2P", b"ERROR"), timeout)
+    
+    def _read_until(self, markers, timeout):
+        """Collect module output until any of markers (bytes) shows up, at most timeout seconds"""
+        deadline = time.monotonic() + timeout
+        response = b""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self._selector is not None:
+                # Sleep in select() until the module writes something, then take all of it
+                if not self._selector.select(timeout=remaining):
+                    break
+                response += self.connection.read(self.connection.in_waiting or 1)
+            else:
+                response += self.connection.readline()
+            if any(marker in response for marker in markers):
+                break
+        return response.decode(errors='replace').strip()
+    
+    def _at(self, cmd, timeout=0.8):
+        """Send an AT command and return its response as soon as OK or an error arrives"""
+        self.connection.write(cmd.encode() + b"\r\n")
+        return self._read_until((b"OK", b"ERROR"), timeout)
+    
+    def _open_selector(self):
+        """Selector on the serial fd (POSIX), or None where the port is not selectable (Windows)"""
+        try:
+            selector = selectors.DefaultSelector()
+            selector.register(self.connection.fileno(), selectors.EVENT_READ)
+            return selector
+        except Exception:
+            return None
+    
+    def send_rak_packet(self, packet):
+        """Send a single packet (raw bytes) via RAK3172 with enhanced error handling"""
+        self._tx_confirmed = False
         try:
-            # Send packet using AT+PSEND
-            cmd = f"AT+PSEND={data_hex}\r\n"
-            self.connection.write(cmd.encode())
-            time.sleep(1.5)  # Wait for transmission
+            # Send packet using AT+PSEND - hex-encoded in C straight to ASCII bytes, no str round trip
+            cmd = b"".join((self._PSEND_PREFIX, binascii.b2a_hex(packet).upper(), self._CRLF))
+            self.connection.write(cmd)
+            self._last_tx_monotonic = time.monotonic()
+            self._last_tx_airtime = _lora_airtime(len(packet))
+            self._airtime_total += self._last_tx_airtime
             
-            # Check response
-            response = ""
-            if self.connection.in_waiting:
-                response = self.connection.read_all().decode().strip()
+            # Wait for transmission - returns as soon as the module reports the outcome
+            response = self.read_tx_response()
             
             # Enhanced success checking
             if "+EVT:TXP2P" in response:
+                self._tx_confirmed = True
                 return True  # Confirmed transmission
             elif "OK" in response:
                 return True  # AT command accepted
@@ -629,11 +1111,11 @@ class RAK3172ImageTransmitter:
                 print("⚠️  Module busy, retrying...")
                 time.sleep(2)
                 # Retry once
-                self.connection.write(cmd.encode())
-                time.sleep(1.5)
-                retry_response = ""
-                if self.connection.in_waiting:
-                    retry_response = self.connection.read_all().decode().strip()
+                self.connection.write(cmd)
+                self._last_tx_monotonic = time.monotonic()
+                self._airtime_total += self._last_tx_airtime
+                retry_response = self.read_tx_response()
+                self._tx_confirmed = "+EVT:TXP2P" in retry_response
                 return "+EVT:TXP2P" in retry_response or "OK" in retry_response
             else:
                 print(f"⚠️  Unexpected response: {response}")
@@ -643,13 +1125,37 @@ class RAK3172ImageTransmitter:
             print(f"❌ Send packet error: {e}")
             return False
     
+    def pace_tx(self, guard=0.02):
+        """
+        Wait until the last packet has had time to leave the radio - replaces fixed sleeps
+        No wait if the module already reported +EVT:TXP2P
+        """
+        if self._tx_confirmed:
+            return
+        remaining = self._last_tx_monotonic + self._last_tx_airtime + guard - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+    
+    def duty_cycle_wait(self, record):
+        """Seconds still to wait after record's image to respect self.duty_cycle (0 if not enforced)"""
+        if not self.duty_cycle:
+            return 0.0
+        off_time = record.airtime * (1 / self.duty_cycle - 1)
+        return max(0.0, off_time - (time.time() - record.end_time))
+    
+    def _report_progress(self, label, sent, total, successful):
+        """Write a progress line every 16 packets, once a second and on the last one - not per packet"""
+        now = time.monotonic()
+        if sent < total and sent % 16 and now - self._progress_time < 1.0:
+            return
+        self._progress_time = now
+        sys.stdout.write(f"📡 {label}: {sent}/{total} sent ({successful} ✅, {sent - successful} ❌)\n")
+        sys.stdout.flush()
+    
     def fragment_data(self, data, max_payload=180):
         """Fragment image data for LoRa transmission - SUPPORTS LARGE IMAGES"""
-        # Reserve space for packet header
-        header_size = 15  # packet_type(1) + image_id(8) + fragment_info(6)
-        chunk_size = max_payload - header_size
+        chunk_size = self.chunk_size(max_payload)
         
-        fragments = []
         total_fragments = (len(data) + chunk_size - 1) // chunk_size
         
         # Now supports much larger images - only limited by available memory
@@ -661,13 +1167,36 @@ class RAK3172ImageTransmitter:
         
         print(f"📊 Image fragmentation: {len(data):,} bytes → {total_fragments:,} fragments")
         
-        for i in range(0, len(data), chunk_size):
-            fragment_id = i // chunk_size
-            chunk = data[i:i + chunk_size]
-            fragments.append((fragment_id, chunk))
+        # Fragments are zero-copy views into data, in fragment order, produced lazily as they are sent
+        view = memoryview(data)
+        fragments = (view[i:i + chunk_size] for i in range(0, len(data), chunk_size))
         
         return fragments, total_fragments
     
+    def chunk_size(self, max_payload=180):
+        """Image bytes carried per fragment"""
+        # Reserve space for packet header - type(1) + image_id(8) + '<IIHI'(14) = 23 bytes
+        return max_payload - self._FRAG_STRUCT.size
+    
+    def build_parity(self, data, chunk_size, total_fragments):
+        """XOR parity over interleaved fragment groups - the short last fragment is zero padded"""
+        groups = min(self.parity_fragments, total_fragments)
+        if groups <= 0:
+            return []
+        
+        padded = np.zeros(total_fragments * chunk_size, dtype=np.uint8)
+        padded[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        rows = padded.reshape(total_fragments, chunk_size)
+        
+        return [np.bitwise_xor.reduce(rows[j::groups], axis=0).tobytes() for j in range(groups)]
+    
+    def new_image_id(self, kind, index=0):
+        """
+        8-character image id - the most the packet header carries (longer ids were cut short on air)
+        kind letter + 2-digit index + seconds of the day, e.g. 'b0241873' for batch image 2
+        """
+        return f"{kind[:1]}{index % 100:02d}{int(time.time()) % 86400:05d}"
+    
     def send_image(self, image_data, image_id):
         """Send complete image via LoRa - FIXED: Support for large images >65KB"""
         print(f"📤 Starting transmission of '{image_id}' ({len(image_data)} bytes)")
@@ -675,19 +1204,17 @@ class RAK3172ImageTransmitter:
         # Fragment the image
         fragments, total_fragments = self.fragment_data(image_data)
         transmission_start = time.time()
+        self._progress_time = 0.0  # first progress line of every image is always shown
+        airtime_start = self._airtime_total
         
         # Send start packet - FIXED: Use 'I' (uint32) instead of 'H' (uint16) for large images
         print(f"📡 Sending start packet...")
-        start_time_bytes = struct.pack('<d', transmission_start)
         image_id_bytes = image_id.encode('utf-8')[:8].ljust(8, b'\x00')
         
         # FIXED: Changed from '<HH' to '<II' to support images > 65KB
-        start_packet = (b'S' + image_id_bytes + 
-                       struct.pack('<II', len(image_data), total_fragments) + 
-                       start_time_bytes)
-        start_hex = start_packet.hex().upper()
-        
-        if not self.send_rak_packet(start_hex):
+        start_packet = self._START_STRUCT.pack(b'S', image_id_bytes, len(image_data), total_fragments,
+                                               transmission_start)
+        if not self.send_rak_packet(start_packet):
             print("❌ Failed to send start packet")
             print("💡 Possible causes:")
             print("   • LoRa connection lost")
@@ -695,35 +1222,64 @@ class RAK3172ImageTransmitter:
             print("   • Check COM port connection")
             return None
         
-        time.sleep(0.5)
+        self.pace_tx()
         
         # Send fragments - FIXED: Use 'I' for fragment_id and total_fragments
         successful_fragments = 0
-        for fragment_id, chunk in fragments:
+        pkt_buf = self._pkt_buf
+        header_size = self._FRAG_STRUCT.size
+        for fragment_id, chunk in enumerate(fragments):
             # FIXED: Changed from '<HHH' to '<IIH' (fragment_id and total_fragments as uint32, chunk length as uint16)
-            packet = (b'F' + image_id_bytes + 
-                     struct.pack('<IIH', fragment_id, total_fragments, len(chunk)) + 
-                     chunk)
-            packet_hex = packet.hex().upper()
+            # Header packed in place, chunk copied in behind it - no per-fragment packet allocation
+            # zlib.crc32 runs in C (hardware-accelerated on most CPUs); the receiver drops fragments that don't match
+            self._FRAG_STRUCT.pack_into(pkt_buf, 0, b'F', image_id_bytes, fragment_id, total_fragments, len(chunk),
+                                        zlib.crc32(chunk))
+            packet_size = header_size + len(chunk)
+            pkt_buf[header_size:packet_size] = chunk
+            packet = memoryview(pkt_buf)[:packet_size]
             
-            print(f"📡 Sending fragment {fragment_id + 1:2d}/{total_fragments} ({len(chunk):3d} bytes)", end="")
+            if self.verbose:
+                print(f"📡 Sending fragment {fragment_id + 1:2d}/{total_fragments} ({len(chunk):3d} bytes)", end="")
             
-            if self.send_rak_packet(packet_hex):
-                successful_fragments += 1
-                print(" ✅")
+            ok = self.send_rak_packet(packet)
+            successful_fragments += ok
+            if self.verbose:
+                print(" ✅" if ok else " ❌")
             else:
-                print(" ❌")
+                self._report_progress("Fragments", fragment_id + 1, total_fragments, successful_fragments)
             
-            time.sleep(0.3)  # Brief pause between fragments
+            # Pause between fragments only for as long as the packet can still be on air
+            self.pace_tx()
+        
+        # Send parity fragments so the receiver can repair a few lost fragments
+        parity = self.build_parity(image_data, self.chunk_size(), total_fragments)
+        successful_parity = 0
+        for parity_id, parity_chunk in enumerate(parity):
+            # Assembled in the same reused buffer as the fragments
+            self._PARITY_STRUCT.pack_into(pkt_buf, 0, b'P', image_id_bytes, parity_id, len(parity),
+                                          len(parity_chunk), zlib.crc32(parity_chunk))
+            packet_size = self._PARITY_STRUCT.size + len(parity_chunk)
+            pkt_buf[self._PARITY_STRUCT.size:packet_size] = parity_chunk
+            packet = memoryview(pkt_buf)[:packet_size]
+            
+            if self.verbose:
+                print(f"📡 Sending parity {parity_id + 1:2d}/{len(parity)} ({len(parity_chunk):3d} bytes)", end="")
+            
+            ok = self.send_rak_packet(packet)
+            successful_parity += ok
+            if self.verbose:
+                print(" ✅" if ok else " ❌")
+            else:
+                self._report_progress("Parity", parity_id + 1, len(parity), successful_parity)
+            
+            self.pace_tx()
         
         # Send end packet
         transmission_end = time.time()
-        end_time_bytes = struct.pack('<d', transmission_end)
-        end_packet = b'E' + image_id_bytes + end_time_bytes
-        end_hex = end_packet.hex().upper()
+        end_packet = self._END_STRUCT.pack(b'E', image_id_bytes, transmission_end)
         
         print(f"📡 Sending end packet...")
-        if not self.send_rak_packet(end_hex):
+        if not self.send_rak_packet(end_packet):
             print("❌ Failed to send end packet")
             print("⚠️  Image data was transmitted but end marker failed")
             print("💡 Receiver may still reconstruct the image")
@@ -733,19 +1289,20 @@ class RAK3172ImageTransmitter:
         success_rate = (successful_fragments / total_fragments) * 100
         
         # Log transmission
-        record = {
-            'image_id': image_id,
-            'start_time': transmission_start,
-            'end_time': transmission_end,
-            'duration': duration,
-            'image_size': len(image_data),
-            'total_fragments': total_fragments,
-            'successful_fragments': successful_fragments,
-            'success_rate': success_rate,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        self.transmission_log.append(record)
+        record = TxRecord(
+            image_id=image_id,
+            start_time=transmission_start,
+            end_time=transmission_end,
+            duration=duration,
+            image_size=len(image_data),
+            total_fragments=total_fragments,
+            successful_fragments=successful_fragments,
+            success_rate=success_rate,
+            timestamp=datetime.now().isoformat(),
+            airtime=self._airtime_total - airtime_start
+        )
+        
+        self._log_transmission(record)
         
         print(f"✅ Transmission completed!")
         print(f"   Duration: {duration:.2f}s")
@@ -754,17 +1311,24 @@ class RAK3172ImageTransmitter:
         
         return record
     
+    def _log_transmission(self, record):
+        """Add a send_image record to the totals print_statistics reports"""
+        self._tx_count += 1
+        self._tx_total_duration += record.duration
+        self._tx_total_success += record.success_rate
+        self._tx_total_size += record.image_size
+    
     def print_statistics(self):
         """Print transmission statistics"""
-        if not self.transmission_log:
+        total_tx = self._tx_count
+        if not total_tx:
             print("📊 No transmissions yet")
             return
         
-        total_tx = len(self.transmission_log)
-        avg_duration = sum(r['duration'] for r in self.transmission_log) / total_tx
-        avg_success = sum(r['success_rate'] for r in self.transmission_log) / total_tx
-        total_size = sum(r['image_size'] for r in self.transmission_log)
-        total_time = sum(r['duration'] for r in self.transmission_log)
+        total_time = self._tx_total_duration
+        avg_duration = total_time / total_tx
+        avg_success = self._tx_total_success / total_tx
+        total_size = self._tx_total_size
         
         print(f"\n📊 Transmission Statistics:")
         print(f"   Total images sent: {total_tx}")
@@ -775,14 +1339,640 @@ class RAK3172ImageTransmitter:
     
     def cleanup(self):
         """Clean up resources"""
+        if self._capturer is not None:
+            self._capturer.shutdown(wait=True)  # let an in-flight capture finish before releasing the camera
         if self.camera:
             self.camera.release()
+        if self._selector:
+            self._selector.close()
         if self.connection:
+            # Leave the module at the configured rate so the next run can talk to it
+            if self.connection.baudrate != self.baud_rate:
+                try:
+                    self.switch_baud_rate(self.baud_rate)
+                except Exception as e:
+                    print(f"⚠️  Could not restore {self.baud_rate} baud: {e}")
             self.connection.close()
+    
+    # Interactive commands - one method per REPL command, looked up in _COMMANDS by main()
+    def _cmd_help(self, arg):
+        """Show all commands, or detailed help for one (help <cmd>)"""
+        self.print_help(arg or None)
+    
+    @_safe_cmd('Test error')
+    def _cmd_test(self, arg):
+        """LoRa connection test mode - send text strings until 'back'"""
+        print("🧪 LoRa Connection Test Mode")
+        print("Send simple text messages to verify TX-RX communication")
+        print("Type 'back' to return to main menu")
+        
+        while True:
+            message = input("Test message> ").strip()
+            
+            if message.lower() == 'back':
+                break
+            elif message:
+                success = self.send_test_string(message)
+                if success:
+                    print("💡 Check receiver for the message!")
+                else:
+                    print("❌ Test failed - check LoRa connection")
+            else:
+                print("💡 Enter a message or 'back' to exit test mode")
+    
+    @_safe_cmd('Check error')
+    def _cmd_check(self, arg):
+        """Check LoRa module status and connection"""
+        print("🔍 Checking LoRa Module Status")
+        print("=" * 40)
+        
+        # Test 1: Basic AT command
+        print("1. Testing basic AT command...")
+        try:
+            self.connection.write(b"AT\r\n")
+            time.sleep(1)
+            response = self.connection.read_all().decode().strip()
+            if "OK" in response:
+                print("   ✅ AT command working")
+            elif response:
+                print(f"   ⚠️  AT response: {response}")
+            else:
+                print("   ❌ No AT response")
+        except Exception as at_error:
+            print(f"   ❌ AT error: {at_error}")
+        
+        # Test 2: Module version
+        print("2. Checking module version...")
+        try:
+            self.connection.write(b"ATZ\r\n")
+            time.sleep(1)
+            response = self.connection.read_all().decode().strip()
+            if "RAK3172" in response:
+                print("   ✅ RAK3172 module detected")
+            elif response:
+                print(f"   ⚠️  Version response: {response}")
+            else:
+                print("   ❌ No version response")
+        except Exception as ver_error:
+            print(f"   ❌ Version error: {ver_error}")
+        
+        # Test 3: P2P mode check
+        print("3. Checking P2P mode...")
+        try:
+            self.connection.write(b"AT+NWM?\r\n")
+            time.sleep(1)
+            response = self.connection.read_all().decode().strip()
+            if "P2P" in response or "0" in response:
+                print("   ✅ P2P mode active")
+            else:
+                print(f"   ⚠️  Mode response: {response}")
+        except Exception as mode_error:
+            print(f"   ❌ Mode error: {mode_error}")
+        
+        # Test 4: Simple send test
+        print("4. Testing simple transmission...")
+        test_result = self.send_test_string("CHECK_TEST")
+        if test_result:
+            print("   ✅ Transmission test passed")
+        else:
+            print("   ❌ Transmission test failed")
+        
+        print("\n💡 If any tests failed:")
+        print("   • Check COM port connection")
+        print("   • Restart the script")
+        print("   • Check receiver is running")
+        print("   • Verify USB cable connection")
+    
+    @_safe_cmd()
+    def _cmd_folder(self, arg):
+        """Set a custom image folder path"""
+        current_folder = self.image_folder
+        print(f"📁 Current image folder: {os.path.abspath(current_folder)}")
+        
+        new_folder = input("Enter new folder path (or press Enter to keep current): ").strip()
+        if new_folder:
+            self.image_folder = new_folder
+            print(f"✅ Image folder changed to: {os.path.abspath(new_folder)}")
+            
+            # Scan the new folder
+            self.scan_image_folder()
+    
+    @_safe_cmd(hint="💡 If this persists, try 'check' command")
+    def _cmd_resize_image_res(self, arg):
+        """Send a folder image resized to a custom resolution"""
+        image_files = self.scan_image_folder()
+        if not image_files:
+            return
+        
+        print(f"\n📏 RESIZE-IMAGE-RES MODE - Custom Resolution Resizing")
+        
+        # Get user selection
+        try:
+            choice = int(input("Enter image number to resize and send: "))
+            if 0 <= choice < len(image_files):
+                selected_file = image_files[choice]
+                filename = os.path.basename(selected_file)
+                
+                # Show original image info
+                temp_image = cv2.imread(selected_file)
+                if temp_image is not None:
+                    orig_h, orig_w = temp_image.shape[:2]
+                    print(f"📂 Selected: {filename}")
+                    print(f"📏 Original resolution: {orig_w}x{orig_h}")
+                
+                # Get custom resolution
+                print(f"\n📐 Enter custom resolution:")
+                print(f"💡 Suggestions:")
+                print(f"   320x240  - Fast transmission (~3-5 min)")
+                print(f"   480x360  - Medium transmission (~8-12 min)")
+                print(f"   640x480  - Good quality (~15-20 min)")
+                print(f"   800x600  - High quality (~25-35 min)")
+                
+                try:
+                    width = int(input("Enter width (e.g., 320): "))
+                    height = int(input("Enter height (e.g., 240): "))
+                    
+                    if width <= 0 or height <= 0:
+                        print("❌ Invalid dimensions. Width and height must be positive.")
+                        return
+                    
+                    if width > 2000 or height > 2000:
+                        print("❌ Dimensions too large. Maximum recommended: 2000x2000")
+                        return
+                    
+                    # Get quality setting
+                    quality = input("Enter JPEG quality 1-100 (default 75): ").strip()
+                    quality = int(quality) if quality else 75
+                    
+                    print(f"\n📏 Will resize to: {width}x{height}")
+                    print(f"🎯 Quality: {quality}%")
+                    
+                    # Estimate size and time
+                    estimated_pixels = width * height
+                    estimated_size = estimated_pixels * 0.3  # Rough estimate
+                    estimated_fragments = int(estimated_size / self.chunk_size())
+                    estimated_minutes = (estimated_fragments * 1.8) / 60
+                    
+                    print(f"⏱️  Estimated transmission: ~{estimated_minutes:.1f} minutes")
+                    
+                    # Confirm before processing
+                    confirm = input("Proceed with resizing and transmission? (y/n): ").lower().strip()
+                    if confirm != 'y':
+                        print("❌ Transmission cancelled")
+                        return
+                    
+                    # Test LoRa connection
+                    print("🔍 Testing LoRa connection...")
+                    test_success = self.send_test_string("RESIZE_TEST")
+                    if not test_success:
+                        print("❌ LoRa connection test failed!")
+                        print("💡 Try 'check' command to diagnose the issue")
+                        return
+                    
+                    print("✅ LoRa connection test passed!")
+                    
+                    # Load and resize image
+                    print(f"📂 Loading and resizing image...")
+                    image_data = self.load_image_file(
+                        selected_file, 
+                        quality=quality, 
+                        target_size=(width, height)
+                    )
+                    
+                    # Attempt transmission
+                    image_id = self.new_image_id('r')
+                    print(f"📡 Starting transmission...")
+                    
+                    tx_record = self.send_image(image_data, image_id)
+                    
+                    if tx_record is not None:
+                        print(f"✅ Resized image transmission completed!")
+                        print(f"   Original: {orig_w}x{orig_h} → Resized: {width}x{height}")
+                        print(f"   Duration: {tx_record.duration/60:.1f} minutes")
+                        print(f"   Success rate: {tx_record.success_rate:.1f}%")
+                        print(f"   Final size: {len(image_data):,} bytes")
+                    else:
+                        print(f"❌ Transmission failed!")
+                        print(f"💡 Try 'check' command to diagnose LoRa issues")
+                    
+                except ValueError:
+                    print("❌ Invalid dimensions. Please enter numbers only.")
+                    return
+                
+            else:
+                print("❌ Invalid selection")
+        except ValueError:
+            print("❌ Please enter a valid number")
+    
+    @_safe_cmd()
+    def _cmd_send_folder_image(self, arg):
+        """Send a folder image by number (send-folder-image <n>)"""
+        # Parse argument: "send-folder-image 0" or "send-folder-image"
+        parts = arg.split()
+        
+        if not parts:
+            # No number provided, show usage
+            print("📁 Send-Folder-Image Command")
+            print("Usage: send-folder-image <image_number>")
+            print("First run 'scan' to see numbered images, then use:")
+            print("  send-folder-image 0    # Send first image")
+            print("  send-folder-image 3    # Send fourth image")
+            return
+        
+        try:
+            image_number = int(parts[0])
+        except ValueError:
+            print("❌ Invalid image number. Use: send-folder-image <number>")
+            return
+        
+        # Get current image list
+        image_files = self.scan_image_folder()
+        if not image_files:
+            print("❌ No images found. Use 'folder' to set image directory.")
+            return
+        
+        if image_number < 0 or image_number >= len(image_files):
+            print(f"❌ Image number {image_number} out of range (0-{len(image_files)-1})")
+            print("💡 Run 'scan' to see available images")
+            return
+        
+        selected_file = image_files[image_number]
+        filename = os.path.basename(selected_file)
+        
+        print(f"📂 Sending image {image_number}: {filename}")
+        
+        # Use smart loading - no size restrictions now that we support large images
+        try:
+            # Use balanced quality
+            image_data = self.load_image_file(selected_file, quality=70)
+            
+            image_id = self.new_image_id('f', image_number)
+            self.send_image(image_data, image_id)
+            
+        except Exception as size_error:
+            print(f"❌ Error processing image: {size_error}")
+            print("💡 Try using 'original' command with lower quality settings")
+    
+    @_safe_cmd()
+    def _cmd_send(self, arg):
+        """Capture and send from camera - send <n> sends n images back to back"""
+        try:
+            num_images = int(arg) if arg else 1
+        except ValueError:
+            print("❌ Usage: send [number of images]")
+            return
+        
+        if num_images <= 0:
+            print("❌ Number of images must be positive")
+            return
+        
+        if num_images == 1:
+            print("📸 Capturing optimized image...")
+            image_data = self.request_capture(quality=60).result()  # Balanced quality
+            
+            image_id = self.new_image_id('c')
+            self.send_image(image_data, image_id)
+            return
+        
+        # Burst: frames are captured and encoded on the capture thread (cv2 and serial I/O release the GIL)
+        print(f"📸 Capturing and sending {num_images} images...")
+        pending = self.request_capture(60)
+        sent = 0
+        for i in range(num_images):
+            image_data = pending.result()
+            pending = None
+            more = i < num_images - 1
+            
+            # Without a duty-cycle wait, frame i+1 is captured while frame i is on air
+            if more and not self.duty_cycle:
+                pending = self.request_capture(60)
+            
+            _log.debug("📸 Image %d/%d", i + 1, num_images)
+            image_id = self.new_image_id('c', i)
+            tx_record = self.send_image(image_data, image_id)
+            if tx_record is not None:
+                sent += 1
+            
+            if pending is None and more:
+                # Off time comes from this image's airtime, not a fixed spacer. The next frame is
+                # captured during the last second of the wait so it isn't minutes old when sent
+                wait = self.duty_cycle_wait(tx_record) if tx_record is not None else 0
+                if wait > 0:
+                    print(f"⏳ Duty cycle: waiting {wait:.1f}s before next image...")
+                    time.sleep(max(0.0, wait - 1.0))
+                pending = self.request_capture(60)
+                if wait > 0:
+                    time.sleep(min(wait, 1.0))
+        
+        if sent == num_images:
+            print(f"✅ Burst of {num_images} images completed")
+        else:
+            print(f"⚠️  Burst finished: {sent}/{num_images} images sent")
+    
+    @_safe_cmd()
+    def _cmd_capture(self, arg):
+        """Capture an image and save it to the folder"""
+        print("📸 Capturing image to save...")
+        image_data = self.request_capture(quality=70).result()  # Higher quality for storage
+        
+        filename = input("Enter filename (or press Enter for auto): ").strip()
+        if not filename:
+            filename = None
+        elif not filename.lower().endswith(('.jpg', '.jpeg')):
+            filename += '.jpg'
+        
+        saved_path = self.save_captured_image(image_data, filename)
+        if saved_path:
+            print(f"✅ Image captured and saved. Use 'original' command to send it later.")
+    
+    @_safe_cmd()
+    def _cmd_scan(self, arg):
+        """Scan and analyze images in the current folder"""
+        self.scan_image_folder()
+    
+    @_safe_cmd(hint="💡 If this persists, try 'check' command")
+    def _cmd_original(self, arg):
+        """Send a folder image at original resolution"""
+        image_files = self.scan_image_folder()
+        if not image_files:
+            return
+        
+        print(f"\n🎯 ORIGINAL RESOLUTION MODE - Now supports large images!")
+        
+        # Get user selection
+        try:
+            choice = int(input("Enter image number to send: "))
+            if 0 <= choice < len(image_files):
+                selected_file = image_files[choice]
+                filename = os.path.basename(selected_file)
+                
+                # Get quality setting
+                quality = input("Enter JPEG quality 1-100 (default 85): ").strip()
+                quality = int(quality) if quality else 85
+                
+                print(f"\n📂 Preparing {filename}...")
+                
+                # Test LoRa connection BEFORE loading image
+                print("🔍 Testing LoRa connection before transmission...")
+                test_success = self.send_test_string("ORIGINAL_TEST")
+                
+                if not test_success:
+                    print("❌ LoRa connection test FAILED!")
+                    print("💡 Cannot proceed with image transmission")
+                    print("🔧 Try 'check' command to diagnose the issue")
+                    return
+                
+                print("✅ LoRa connection test PASSED!")
+                
+                # Load image using the UNIFIED method (target_pixels = 640*480)
+                print(f"📂 Loading image using unified method...")
+                image_data = self.load_image_file(selected_file, quality)
+                
+                # Attempt transmission
+                image_id = self.new_image_id('o')
+                print(f"📡 Starting transmission...")
+                
+                tx_record = self.send_image(image_data, image_id)
+                
+                if tx_record is not None:
+                    print(f"✅ Original image transmission completed!")
+                    print(f"   Duration: {tx_record.duration/60:.1f} minutes")
+                    print(f"   Success rate: {tx_record.success_rate:.1f}%")
+                else:
+                    print(f"❌ Transmission failed!")
+                    print(f"💡 Try 'check' command to diagnose LoRa issues")
+                
+            else:
+                print("❌ Invalid selection")
+        except ValueError:
+            print("❌ Please enter a valid number")
+    
+    @_safe_cmd()
+    def _cmd_batch(self, arg):
+        """Send a range of folder images sequentially"""
+        try:
+            image_files = self.scan_image_folder()
+            if not image_files:
+                return
+            
+            print(f"\n🔄 BATCH TRANSMISSION MODE - Now supports large images!")
+            
+            # Get range of images to send
+            start_idx = input(f"Enter start image number (0-{len(image_files)-1}, default 0): ").strip()
+            start_idx = int(start_idx) if start_idx else 0
+            
+            end_idx = input(f"Enter end image number (0-{len(image_files)-1}, default {len(image_files)-1}): ").strip()
+            end_idx = int(end_idx) if end_idx else len(image_files)-1
+            
+            if start_idx < 0 or end_idx >= len(image_files) or start_idx > end_idx:
+                print("❌ Invalid range")
+                return
+            
+            # Get quality and mode
+            quality = input("Enter JPEG quality 1-100 (default 85): ").strip()
+            quality = int(quality) if quality else 85
+            
+            mode = input("Send at (o)riginal resolution or (r)esized? (o/r, default o): ").lower().strip()
+            original_mode = mode != 'r'
+            
+            selected_images = image_files[start_idx:end_idx+1]
+            print(f"\n🚀 Will send {len(selected_images)} images from index {start_idx} to {end_idx}")
+            print(f"   Mode: {'ORIGINAL resolution' if original_mode else 'Auto-resized'}")
+            print(f"   Quality: {quality}%")
+            
+            confirm = input("Start batch transmission? (y/n): ").lower().strip()
+            if confirm != 'y':
+                print("❌ Batch transmission cancelled")
+                return
+            
+            # Send images one by one - the next image is loaded/encoded on a worker
+            # thread while the current one is on air (cv2 and serial I/O release the GIL).
+            # Its messages are held back and printed when the image's turn comes
+            loader = ThreadPoolExecutor(max_workers=1)
+            prefetched = None
+            for i, file_path in enumerate(selected_images):
+                filename = os.path.basename(file_path)
+                print(f"\n📤 Batch {i+1}/{len(selected_images)}: {filename}")
+                
+                try:
+                    # Load image data using UNIFIED method (target_pixels = 640*480)
+                    if prefetched is not None:
+                        (pending, messages), prefetched = prefetched, None
+                        try:
+                            image_data = pending.result()
+                        finally:
+                            for message in messages:
+                                print(message)
+                    else:
+                        image_data = self.load_image_file(file_path, quality)
+                    
+                    if i < len(selected_images) - 1:
+                        messages = []
+                        prefetched = (loader.submit(self.load_image_file, selected_images[i+1], quality,
+                                                    report=messages.append), messages)
+                    
+                    print(f"📊 Image size: {len(image_data):,} bytes")
+                    
+                    # For very large images, show estimated time and ask for confirmation
+                    chunk = self.chunk_size()
+                    estimated_fragments = (len(image_data) + chunk - 1) // chunk
+                    estimated_seconds = estimated_fragments * 1.8
+                    if self.duty_cycle and i < len(selected_images) - 1:
+                        # The off time before the next image is part of this image's cost
+                        airtime = estimated_fragments * _lora_airtime(chunk + self._FRAG_STRUCT.size)
+                        estimated_seconds += airtime * (1 / self.duty_cycle - 1)
+                    estimated_minutes = estimated_seconds / 60
+                    
+                    if estimated_minutes > 20:
+                        wait_note = " incl. duty-cycle wait" if self.duty_cycle and i < len(selected_images) - 1 else ""
+                        print(f"⏱️  Estimated transmission: ~{estimated_minutes:.1f} minutes{wait_note}")
+                        print(f"📊 This is a large image with {estimated_fragments:,} fragments")
+                        
+                        continue_choice = input(f"Proceed with this large transmission? (y/n): ").lower().strip()
+                        if continue_choice != 'y':
+                            print(f"⏭️  Skipping {filename}")
+                            continue
+                    
+                    # Check LoRa connection before transmission
+                    print("🔍 Testing LoRa connection...")
+                    test_success = self.send_test_string("BATCH_TEST")
+                    if not test_success:
+                        print("❌ LoRa connection test failed!")
+                        print("💡 Try 'check' command to diagnose the issue")
+                        
+                        retry_choice = input("Try to continue anyway? (y/n): ").lower().strip()
+                        if retry_choice != 'y':
+                            print("🛑 Batch transmission stopped")
+                            break
+                    
+                    # Attempt transmission
+                    image_id = self.new_image_id('b', i)
+                    print(f"📡 Starting transmission of {image_id}...")
+                    
+                    tx_record = self.send_image(image_data, image_id)
+                    
+                    # Check if transmission was successful
+                    if tx_record is not None:
+                        print(f"✅ Batch {i+1} completed successfully")
+                        print(f"   Duration: {tx_record.duration/60:.1f} minutes")
+                        print(f"   Success rate: {tx_record.success_rate:.1f}%")
+                        print(f"   Throughput: {(tx_record.image_size*8)/(tx_record.duration*1000):.2f} Kbps")
+                    else:
+                        print(f"❌ Batch {i+1} failed - transmission returned None")
+                        print("💡 Try 'check' command to diagnose LoRa issues")
+                        
+                        continue_choice = input("Continue with remaining images? (y/n): ").lower().strip()
+                        if continue_choice != 'y':
+                            print("🛑 Batch transmission stopped")
+                            break
+                    
+                    if i < len(selected_images) - 1 and tx_record is not None:  # Don't wait after last image
+                        # Off time comes from this image's airtime, not a fixed spacer
+                        wait = self.duty_cycle_wait(tx_record)
+                        if wait > 0:
+                            print(f"⏳ Duty cycle: waiting {wait:.1f}s before next image...")
+                            time.sleep(wait)
+                
+                except Exception as e:
+                    print(f"❌ Error with {filename}: {e}")
+                    print(f"💡 Possible causes:")
+                    print(f"   • LoRa connection issue")
+                    print(f"   • File corruption")
+                    print(f"   • Image format not supported")
+                    print(f"   • Transmission interrupted")
+                    
+                    continue_batch = input("Continue with remaining images? (y/n): ").lower().strip()
+                    if continue_batch != 'y':
+                        print("🛑 Batch transmission stopped")
+                        break
+            
+            loader.shutdown(wait=False)
+            print(f"✅ Batch transmission completed!")
+            
+        except ValueError:
+            print("❌ Invalid input")
+    
+    def _cmd_gray(self, arg):
+        """Toggle grayscale JPEGs"""
+        self.colour = not self.colour
+        if self.colour:
+            print("🎨 Colour JPEGs enabled")
+        else:
+            print("⚫ Grayscale JPEGs enabled - no chroma, roughly a third fewer bytes to send")
+    
+    def _cmd_subsample(self, arg):
+        """Show or set JPEG chroma subsampling (subsample 420|422|444)"""
+        if arg:
+            if arg not in ('420', '422', '444'):
+                print("❌ Usage: subsample 420|422|444")
+                return
+            self.jpeg_subsample = arg
+        print(f"🎨 Chroma subsampling: 4:{self.jpeg_subsample[1]}:{self.jpeg_subsample[2]}"
+              f"{' (smallest)' if self.jpeg_subsample == '420' else ' - larger JPEGs, longer transmission'}")
+    
+    def _cmd_duty(self, arg):
+        """Show or set the duty-cycle limit (duty <percent> | duty off)"""
+        if arg:
+            if arg.lower() == 'off':
+                self.duty_cycle = None
+            else:
+                try:
+                    percent = float(arg.rstrip('%'))
+                except ValueError:
+                    print("❌ Usage: duty <percent> | duty off")
+                    return
+                if not 0 < percent <= 100:
+                    print("❌ Duty cycle must be between 0 and 100%")
+                    return
+                self.duty_cycle = percent / 100
+        if self.duty_cycle:
+            print(f"⏱️  Duty cycle: {self.duty_cycle * 100:g}% - images are spaced by their airtime")
+        else:
+            print("⚠️  Duty cycle not enforced - images are sent back to back (check your regional limits)")
+    
+    def _cmd_verbose(self, arg):
+        """Toggle a line per fragment instead of periodic progress"""
+        self.verbose = not self.verbose
+        _log.setLevel(logging.DEBUG if self.verbose else logging.WARNING)
+        if self.verbose:
+            print("🔊 Per-fragment output enabled")
+        else:
+            print("🔇 Per-fragment output disabled - progress shown every 16 fragments")
+    
+    def _cmd_stats(self, arg):
+        """Show transmission statistics"""
+        self.print_statistics()
+    
+    _COMMANDS = {
+        'help': _cmd_help,
+        'test': _cmd_test,
+        'check': _cmd_check,
+        'folder': _cmd_folder,
+        'resize-image-res': _cmd_resize_image_res,
+        'send-folder-image': _cmd_send_folder_image,
+        'send': _cmd_send,
+        'capture': _cmd_capture,
+        'scan': _cmd_scan,
+        'original': _cmd_original,
+        'batch': _cmd_batch,
+        'gray': _cmd_gray,
+        'subsample': _cmd_subsample,
+        'duty': _cmd_duty,
+        'verbose': _cmd_verbose,
+        'stats': _cmd_stats,
+    }
 
 
 def main():
     """Main transmitter application"""
+    # UTF-8 output so the emoji prints don't raise UnicodeEncodeError when redirected to a file or pipe
+    try:
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    except AttributeError:
+        pass
+    # Loop chatter goes through logging at DEBUG - silent unless 'verbose' is on
+    logging.basicConfig(level=logging.WARNING, format="%(message)s", stream=sys.stdout)
+    
     print("📤 RAK3172 LoRa Image Transmitter - FIXED for Large Images")
     print("=" * 60)
     
@@ -826,509 +2016,31 @@ def main():
     print("  original      - Send image at ORIGINAL resolution")
     print("  batch         - Send multiple images sequentially")
     if need_camera:
-        print("  send          - Capture and send from camera")
+        print("  send [n]      - Capture and send n images from camera (default 1)")
         print("  capture       - Capture image and save to folder")
+    print("  gray          - Toggle grayscale JPEGs (smaller, faster to send)")
+    print("  subsample     - Set chroma subsampling: 420 (default), 422 or 444")
+    print("  duty          - Set duty-cycle limit in % between images, or 'duty off' (default)")
+    print("  verbose       - Toggle per-fragment output")
     print("  stats         - Show transmission statistics")
     print("  quit          - Exit")
     
     try:
         while True:
-            command = input(f"\nTransmitter> ").strip().lower()
+            # Parsed once: verb looked up in the command table, the rest of the line is its argument
+            verb, _, arg = input("\nTransmitter> ").strip().partition(' ')
+            verb = verb.lower()
+            handler = transmitter._COMMANDS.get(verb)
             
-            if command == 'quit':
+            if verb == 'quit':
                 break
             
-            elif command == 'help':
-                transmitter.print_help()
-                
-            elif command.startswith('help '):
-                help_cmd = command.split(' ', 1)[1]
-                transmitter.print_help(help_cmd)
-                
-            elif command == 'test':
-                try:
-                    print("🧪 LoRa Connection Test Mode")
-                    print("Send simple text messages to verify TX-RX communication")
-                    print("Type 'back' to return to main menu")
-                    
-                    while True:
-                        message = input("Test message> ").strip()
-                        
-                        if message.lower() == 'back':
-                            break
-                        elif message:
-                            success = transmitter.send_test_string(message)
-                            if success:
-                                print("💡 Check receiver for the message!")
-                            else:
-                                print("❌ Test failed - check LoRa connection")
-                        else:
-                            print("💡 Enter a message or 'back' to exit test mode")
-                    
-                except Exception as e:
-                    print(f"❌ Test error: {e}")
-                    
-            elif command == 'check':
-                try:
-                    print("🔍 Checking LoRa Module Status")
-                    print("=" * 40)
-                    
-                    # Test 1: Basic AT command
-                    print("1. Testing basic AT command...")
-                    try:
-                        transmitter.connection.write(b"AT\r\n")
-                        time.sleep(1)
-                        response = transmitter.connection.read_all().decode().strip()
-                        if "OK" in response:
-                            print("   ✅ AT command working")
-                        elif response:
-                            print(f"   ⚠️  AT response: {response}")
-                        else:
-                            print("   ❌ No AT response")
-                    except Exception as at_error:
-                        print(f"   ❌ AT error: {at_error}")
-                    
-                    # Test 2: Module version
-                    print("2. Checking module version...")
-                    try:
-                        transmitter.connection.write(b"ATZ\r\n")
-                        time.sleep(1)
-                        response = transmitter.connection.read_all().decode().strip()
-                        if "RAK3172" in response:
-                            print("   ✅ RAK3172 module detected")
-                        elif response:
-                            print(f"   ⚠️  Version response: {response}")
-                        else:
-                            print("   ❌ No version response")
-                    except Exception as ver_error:
-                        print(f"   ❌ Version error: {ver_error}")
-                    
-                    # Test 3: P2P mode check
-                    print("3. Checking P2P mode...")
-                    try:
-                        transmitter.connection.write(b"AT+NWM?\r\n")
-                        time.sleep(1)
-                        response = transmitter.connection.read_all().decode().strip()
-                        if "P2P" in response or "0" in response:
-                            print("   ✅ P2P mode active")
-                        else:
-                            print(f"   ⚠️  Mode response: {response}")
-                    except Exception as mode_error:
-                        print(f"   ❌ Mode error: {mode_error}")
-                    
-                    # Test 4: Simple send test
-                    print("4. Testing simple transmission...")
-                    test_result = transmitter.send_test_string("CHECK_TEST")
-                    if test_result:
-                        print("   ✅ Transmission test passed")
-                    else:
-                        print("   ❌ Transmission test failed")
-                    
-                    print("\n💡 If any tests failed:")
-                    print("   • Check COM port connection")
-                    print("   • Restart the script")
-                    print("   • Check receiver is running")
-                    print("   • Verify USB cable connection")
-                    
-                except Exception as e:
-                    print(f"❌ Check error: {e}")
-            
-            elif command == 'folder':
-                try:
-                    current_folder = transmitter.image_folder
-                    print(f"📁 Current image folder: {os.path.abspath(current_folder)}")
-                    
-                    new_folder = input("Enter new folder path (or press Enter to keep current): ").strip()
-                    if new_folder:
-                        transmitter.image_folder = new_folder
-                        print(f"✅ Image folder changed to: {os.path.abspath(new_folder)}")
-                        
-                        # Scan the new folder
-                        transmitter.scan_image_folder()
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    
-            elif command == 'resize-image-res':
-                try:
-                    image_files = transmitter.scan_image_folder()
-                    if not image_files:
-                        continue
-                    
-                    print(f"\n📏 RESIZE-IMAGE-RES MODE - Custom Resolution Resizing")
-                    
-                    # Get user selection
-                    try:
-                        choice = int(input("Enter image number to resize and send: "))
-                        if 0 <= choice < len(image_files):
-                            selected_file = image_files[choice]
-                            filename = os.path.basename(selected_file)
-                            
-                            # Show original image info
-                            temp_image = cv2.imread(selected_file)
-                            if temp_image is not None:
-                                orig_h, orig_w = temp_image.shape[:2]
-                                print(f"📂 Selected: {filename}")
-                                print(f"📏 Original resolution: {orig_w}x{orig_h}")
-                            
-                            # Get custom resolution
-                            print(f"\n📐 Enter custom resolution:")
-                            print(f"💡 Suggestions:")
-                            print(f"   320x240  - Fast transmission (~3-5 min)")
-                            print(f"   480x360  - Medium transmission (~8-12 min)")
-                            print(f"   640x480  - Good quality (~15-20 min)")
-                            print(f"   800x600  - High quality (~25-35 min)")
-                            
-                            try:
-                                width = int(input("Enter width (e.g., 320): "))
-                                height = int(input("Enter height (e.g., 240): "))
-                                
-                                if width <= 0 or height <= 0:
-                                    print("❌ Invalid dimensions. Width and height must be positive.")
-                                    continue
-                                
-                                if width > 2000 or height > 2000:
-                                    print("❌ Dimensions too large. Maximum recommended: 2000x2000")
-                                    continue
-                                
-                                # Get quality setting
-                                quality = input("Enter JPEG quality 1-100 (default 75): ").strip()
-                                quality = int(quality) if quality else 75
-                                
-                                print(f"\n📏 Will resize to: {width}x{height}")
-                                print(f"🎯 Quality: {quality}%")
-                                
-                                # Estimate size and time
-                                estimated_pixels = width * height
-                                estimated_size = estimated_pixels * 0.3  # Rough estimate
-                                estimated_fragments = int(estimated_size / 165)
-                                estimated_minutes = (estimated_fragments * 1.8) / 60
-                                
-                                print(f"⏱️  Estimated transmission: ~{estimated_minutes:.1f} minutes")
-                                
-                                # Confirm before processing
-                                confirm = input("Proceed with resizing and transmission? (y/n): ").lower().strip()
-                                if confirm != 'y':
-                                    print("❌ Transmission cancelled")
-                                    continue
-                                
-                                # Test LoRa connection
-                                print("🔍 Testing LoRa connection...")
-                                test_success = transmitter.send_test_string("RESIZE_TEST")
-                                if not test_success:
-                                    print("❌ LoRa connection test failed!")
-                                    print("💡 Try 'check' command to diagnose the issue")
-                                    continue
-                                
-                                print("✅ LoRa connection test passed!")
-                                
-                                # Load and resize image
-                                print(f"📂 Loading and resizing image...")
-                                image_data = transmitter.load_image_file(
-                                    selected_file, 
-                                    quality=quality, 
-                                    target_size=(width, height)
-                                )
-                                
-                                # Attempt transmission
-                                image_id = f"resize_{width}x{height}_{datetime.now().strftime('%H%M%S')}"
-                                print(f"📡 Starting transmission...")
-                                
-                                tx_record = transmitter.send_image(image_data, image_id)
-                                
-                                if tx_record is not None:
-                                    print(f"✅ Resized image transmission completed!")
-                                    print(f"   Original: {orig_w}x{orig_h} → Resized: {width}x{height}")
-                                    print(f"   Duration: {tx_record.get('duration', 0)/60:.1f} minutes")
-                                    print(f"   Success rate: {tx_record.get('success_rate', 0):.1f}%")
-                                    print(f"   Final size: {len(image_data):,} bytes")
-                                else:
-                                    print(f"❌ Transmission failed!")
-                                    print(f"💡 Try 'check' command to diagnose LoRa issues")
-                                
-                            except ValueError:
-                                print("❌ Invalid dimensions. Please enter numbers only.")
-                                continue
-                            
-                        else:
-                            print("❌ Invalid selection")
-                    except ValueError:
-                        print("❌ Please enter a valid number")
-                        
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    print(f"💡 If this persists, try 'check' command")
-                    
-            elif command.startswith('send-folder-image'):
-                try:
-                    # Parse command: "send-folder-image 0" or "send-folder-image"
-                    parts = command.split()
-                    
-                    if len(parts) == 1:
-                        # No number provided, show usage
-                        print("📁 Send-Folder-Image Command")
-                        print("Usage: send-folder-image <image_number>")
-                        print("First run 'scan' to see numbered images, then use:")
-                        print("  send-folder-image 0    # Send first image")
-                        print("  send-folder-image 3    # Send fourth image")
-                        continue
-                    
-                    try:
-                        image_number = int(parts[1])
-                    except ValueError:
-                        print("❌ Invalid image number. Use: send-folder-image <number>")
-                        continue
-                    
-                    # Get current image list
-                    image_files = transmitter.scan_image_folder()
-                    if not image_files:
-                        print("❌ No images found. Use 'folder' to set image directory.")
-                        continue
-                    
-                    if image_number < 0 or image_number >= len(image_files):
-                        print(f"❌ Image number {image_number} out of range (0-{len(image_files)-1})")
-                        print("💡 Run 'scan' to see available images")
-                        continue
-                    
-                    selected_file = image_files[image_number]
-                    filename = os.path.basename(selected_file)
-                    
-                    print(f"📂 Sending image {image_number}: {filename}")
-                    
-                    # Use smart loading - no size restrictions now that we support large images
-                    try:
-                        # Use balanced quality
-                        image_data = transmitter.load_image_file(selected_file, quality=70)
-                        
-                        image_id = f"folder_{image_number}_{datetime.now().strftime('%H%M%S')}"
-                        transmitter.send_image(image_data, image_id)
-                        
-                    except Exception as size_error:
-                        print(f"❌ Error processing image: {size_error}")
-                        print("💡 Try using 'original' command with lower quality settings")
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    
-            elif command == 'send' and need_camera:
-                try:
-                    print("📸 Capturing optimized image...")
-                    image_data = transmitter.capture_image(quality=60)  # Balanced quality
-                    
-                    image_id = f"opt_{datetime.now().strftime('%H%M%S')}"
-                    transmitter.send_image(image_data, image_id)
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    
-            elif command == 'capture' and need_camera:
-                try:
-                    print("📸 Capturing image to save...")
-                    image_data = transmitter.capture_image(quality=70)  # Higher quality for storage
-                    
-                    filename = input("Enter filename (or press Enter for auto): ").strip()
-                    if not filename:
-                        filename = None
-                    elif not filename.lower().endswith(('.jpg', '.jpeg')):
-                        filename += '.jpg'
-                    
-                    saved_path = transmitter.save_captured_image(image_data, filename)
-                    if saved_path:
-                        print(f"✅ Image captured and saved. Use 'original' command to send it later.")
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    
-            elif command in ['send', 'capture'] and not need_camera:
+            elif verb in ('send', 'capture') and not need_camera:
                 print("❌ Camera commands not available in folder-only mode")
                 print("💡 Restart and choose option 2 to enable camera features")
             
-            elif command == 'scan':
-                try:
-                    transmitter.scan_image_folder()
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-            
-            elif command == 'original':
-                try:
-                    image_files = transmitter.scan_image_folder()
-                    if not image_files:
-                        continue
-                    
-                    print(f"\n🎯 ORIGINAL RESOLUTION MODE - Now supports large images!")
-                    
-                    # Get user selection
-                    try:
-                        choice = int(input("Enter image number to send: "))
-                        if 0 <= choice < len(image_files):
-                            selected_file = image_files[choice]
-                            filename = os.path.basename(selected_file)
-                            
-                            # Get quality setting
-                            quality = input("Enter JPEG quality 1-100 (default 85): ").strip()
-                            quality = int(quality) if quality else 85
-                            
-                            print(f"\n📂 Preparing {filename}...")
-                            
-                            # Test LoRa connection BEFORE loading image
-                            print("🔍 Testing LoRa connection before transmission...")
-                            test_success = transmitter.send_test_string("ORIGINAL_TEST")
-                            
-                            if not test_success:
-                                print("❌ LoRa connection test FAILED!")
-                                print("💡 Cannot proceed with image transmission")
-                                print("🔧 Try 'check' command to diagnose the issue")
-                                continue
-                            
-                            print("✅ LoRa connection test PASSED!")
-                            
-                            # Load image using the UNIFIED method (target_pixels = 640*480)
-                            print(f"📂 Loading image using unified method...")
-                            image_data = transmitter.load_image_file(selected_file, quality)
-                            
-                            # Attempt transmission
-                            image_id = f"orig_{datetime.now().strftime('%H%M%S')}"
-                            print(f"📡 Starting transmission...")
-                            
-                            tx_record = transmitter.send_image(image_data, image_id)
-                            
-                            if tx_record is not None:
-                                print(f"✅ Original image transmission completed!")
-                                print(f"   Duration: {tx_record.get('duration', 0)/60:.1f} minutes")
-                                print(f"   Success rate: {tx_record.get('success_rate', 0):.1f}%")
-                            else:
-                                print(f"❌ Transmission failed!")
-                                print(f"💡 Try 'check' command to diagnose LoRa issues")
-                            
-                        else:
-                            print("❌ Invalid selection")
-                    except ValueError:
-                        print("❌ Please enter a valid number")
-                        
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    print(f"💡 If this persists, try 'check' command")
-            
-            elif command == 'batch':
-                try:
-                    image_files = transmitter.scan_image_folder()
-                    if not image_files:
-                        continue
-                    
-                    print(f"\n🔄 BATCH TRANSMISSION MODE - Now supports large images!")
-                    
-                    # Get range of images to send
-                    start_idx = input(f"Enter start image number (0-{len(image_files)-1}, default 0): ").strip()
-                    start_idx = int(start_idx) if start_idx else 0
-                    
-                    end_idx = input(f"Enter end image number (0-{len(image_files)-1}, default {len(image_files)-1}): ").strip()
-                    end_idx = int(end_idx) if end_idx else len(image_files)-1
-                    
-                    if start_idx < 0 or end_idx >= len(image_files) or start_idx > end_idx:
-                        print("❌ Invalid range")
-                        continue
-                    
-                    # Get quality and mode
-                    quality = input("Enter JPEG quality 1-100 (default 85): ").strip()
-                    quality = int(quality) if quality else 85
-                    
-                    mode = input("Send at (o)riginal resolution or (r)esized? (o/r, default o): ").lower().strip()
-                    original_mode = mode != 'r'
-                    
-                    selected_images = image_files[start_idx:end_idx+1]
-                    print(f"\n🚀 Will send {len(selected_images)} images from index {start_idx} to {end_idx}")
-                    print(f"   Mode: {'ORIGINAL resolution' if original_mode else 'Auto-resized'}")
-                    print(f"   Quality: {quality}%")
-                    
-                    confirm = input("Start batch transmission? (y/n): ").lower().strip()
-                    if confirm != 'y':
-                        print("❌ Batch transmission cancelled")
-                        continue
-                    
-                    # Send images one by one
-                    for i, file_path in enumerate(selected_images):
-                        filename = os.path.basename(file_path)
-                        print(f"\n📤 Batch {i+1}/{len(selected_images)}: {filename}")
-                        
-                        try:
-                            # Load image data using UNIFIED method (target_pixels = 640*480)
-                            image_data = transmitter.load_image_file(file_path, quality)
-                            
-                            print(f"📊 Image size: {len(image_data):,} bytes")
-                            
-                            # For very large images, show estimated time and ask for confirmation
-                            estimated_fragments = (len(image_data) + 165) // 165
-                            estimated_minutes = (estimated_fragments * 1.8) / 60
-                            
-                            if estimated_minutes > 20:
-                                print(f"⏱️  Estimated transmission: ~{estimated_minutes:.1f} minutes")
-                                print(f"📊 This is a large image with {estimated_fragments:,} fragments")
-                                
-                                continue_choice = input(f"Proceed with this large transmission? (y/n): ").lower().strip()
-                                if continue_choice != 'y':
-                                    print(f"⏭️  Skipping {filename}")
-                                    continue
-                            
-                            # Check LoRa connection before transmission
-                            print("🔍 Testing LoRa connection...")
-                            test_success = transmitter.send_test_string("BATCH_TEST")
-                            if not test_success:
-                                print("❌ LoRa connection test failed!")
-                                print("💡 Try 'check' command to diagnose the issue")
-                                
-                                retry_choice = input("Try to continue anyway? (y/n): ").lower().strip()
-                                if retry_choice != 'y':
-                                    print("🛑 Batch transmission stopped")
-                                    break
-                            
-                            # Attempt transmission
-                            image_id = f"batch_{i:02d}_{datetime.now().strftime('%H%M%S')}"
-                            print(f"📡 Starting transmission of {image_id}...")
-                            
-                            tx_record = transmitter.send_image(image_data, image_id)
-                            
-                            # Check if transmission was successful
-                            if tx_record is not None:
-                                print(f"✅ Batch {i+1} completed successfully")
-                                print(f"   Duration: {tx_record.get('duration', 0)/60:.1f} minutes")
-                                print(f"   Success rate: {tx_record.get('success_rate', 0):.1f}%")
-                                print(f"   Throughput: {(tx_record.get('image_size', 0)*8)/(tx_record.get('duration', 1)*1000):.2f} Kbps")
-                            else:
-                                print(f"❌ Batch {i+1} failed - transmission returned None")
-                                print("💡 Try 'check' command to diagnose LoRa issues")
-                                
-                                continue_choice = input("Continue with remaining images? (y/n): ").lower().strip()
-                                if continue_choice != 'y':
-                                    print("🛑 Batch transmission stopped")
-                                    break
-                            
-                            if i < len(selected_images) - 1:  # Don't wait after last image
-                                print("⏳ Waiting 5 seconds before next image...")
-                                time.sleep(5)
-                        
-                        except Exception as e:
-                            print(f"❌ Error with {filename}: {e}")
-                            print(f"💡 Possible causes:")
-                            print(f"   • LoRa connection issue")
-                            print(f"   • File corruption")
-                            print(f"   • Image format not supported")
-                            print(f"   • Transmission interrupted")
-                            
-                            continue_batch = input("Continue with remaining images? (y/n): ").lower().strip()
-                            if continue_batch != 'y':
-                                print("🛑 Batch transmission stopped")
-                                break
-                    
-                    print(f"✅ Batch transmission completed!")
-                    
-                except ValueError:
-                    print("❌ Invalid input")
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                
-            elif command == 'stats':
-                transmitter.print_statistics()
+            elif handler is not None:
+                handler(transmitter, arg.strip())
             
             else:
                 print("❌ Unknown command.")